@@ -0,0 +1,113 @@
+import json
+import os
+import re
+import time
+import uuid
+from functools import lru_cache
+from typing import List, Optional
+
+from .llm.longwriter import HandbookManifest, topic_key
+
+# Generated handbooks live on disk; chat history only keeps the artifact id.
+# Layout per artifact: <id>.md (full text), <id>.json (topic, word count and
+# byte offsets of each "## " section), optional <id>.manifest.json.
+
+
+def _root() -> str:
+    return os.getenv("HANDBOOK_ARTIFACT_DIR", os.path.join(".cache", "handbooks"))
+
+
+def _path(artifact_id: str, suffix: str) -> str:
+    if not re.fullmatch(r"[A-Za-z0-9_.-]+", artifact_id):
+        raise ValueError(f"Invalid artifact id: {artifact_id!r}")
+    return os.path.join(_root(), artifact_id + suffix)
+
+
+def _section_offsets(data: bytes) -> List[dict]:
+    """Byte ranges of the preamble and of every '## ' section."""
+    starts = [0] + [m.start() + 1 for m in re.finditer(rb"\n## ", data)]
+    sections = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(data)
+        first_line = data[start:end].split(b"\n", 1)[0].decode("utf-8", "replace")
+        title = first_line.lstrip("#").strip() or "Overview"
+        sections.append({"title": title, "start": start, "end": end})
+    return sections
+
+
+def save_handbook(markdown: str, topic: str, manifest: Optional[HandbookManifest] = None) -> str:
+    os.makedirs(_root(), exist_ok=True)
+    slug = re.sub(r"[^a-z0-9]+", "_", topic.lower()).strip("_")[:40] or "handbook"
+    artifact_id = f"{time.strftime('%Y%m%d-%H%M%S')}_{slug}_{uuid.uuid4().hex[:6]}"
+
+    data = markdown.encode("utf-8")
+    with open(_path(artifact_id, ".md"), "wb") as f:
+        f.write(data)
+
+    if manifest is not None:
+        with open(_path(artifact_id, ".manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest.to_dict(), f)
+
+    meta = {
+        "id": artifact_id,
+        "topic": topic,
+        "words": len(markdown.split()),
+        "created": time.time(),
+        "sections": _section_offsets(data),
+        "has_manifest": manifest is not None,
+    }
+    with open(_path(artifact_id, ".json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return artifact_id
+
+
+@lru_cache(maxsize=256)
+def load_meta(artifact_id: str) -> dict:
+    # Artifacts are write-once, so caching the small metadata file is safe
+    with open(_path(artifact_id, ".json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_section(artifact_id: str, index: int) -> str:
+    sec = load_meta(artifact_id)["sections"][index]
+    with open(_path(artifact_id, ".md"), "rb") as f:
+        f.seek(sec["start"])
+        return f.read(sec["end"] - sec["start"]).decode("utf-8", "replace")
+
+
+def artifact_path(artifact_id: str) -> str:
+    return _path(artifact_id, ".md")
+
+
+def exists(artifact_id: str) -> bool:
+    try:
+        return os.path.exists(_path(artifact_id, ".json")) and os.path.exists(_path(artifact_id, ".md"))
+    except ValueError:
+        return False
+
+
+def latest_for_topic(topic: str) -> Optional[str]:
+    """Id of the newest artifact with a manifest for this topic (matched by topic_key), if any."""
+    root = _root()
+    if not os.path.isdir(root):
+        return None
+
+    best, best_created = None, -1.0
+    for name in os.listdir(root):
+        if not name.endswith(".json") or name.endswith(".manifest.json"):
+            continue
+        try:
+            meta = load_meta(name[: -len(".json")])
+        except (OSError, ValueError):
+            continue
+        if meta.get("has_manifest") and topic_key(meta.get("topic", "")) == topic_key(topic) and meta["created"] > best_created:
+            best, best_created = meta["id"], meta["created"]
+    return best
+
+
+def load_manifest(artifact_id: str) -> Optional[HandbookManifest]:
+    path = _path(artifact_id, ".manifest.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return HandbookManifest.from_dict(json.load(f))
@@ -0,0 +1,260 @@
+"""
+Headless batch handbook generation.
+
+    python -m app.batch jobs.jsonl --out handbooks/ --concurrency 2
+
+Each line of the jobs file is one JSON object:
+
+    {"id": "rag-basics", "topic": "Retrieval-Augmented Generation",
+     "doc_ids": [3, 7], "target_words": 20000, "k": 25}
+
+Only "topic" is required. Scope is "doc_ids" or "doc_names" (omit both for all
+documents; an empty list is rejected). Without "id", a stable id is derived from the job fields. Jobs
+whose <id>.md and ok-status <id>.json already exist in the output dir are
+skipped, so an interrupted run can simply be restarted.
+
+With --regenerate, every job is rerun against its saved <id>.manifest.json:
+retrieval is redone, but only sections whose sources changed call the LLM.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from .rag.context import build_context
+from .rag.doc_catalog import get_documents
+from .rag.summaries import build_overview_context
+from .llm.longwriter import LongWriter, HandbookManifest
+
+
+@dataclass
+class Job:
+    job_id: str
+    topic: str
+    doc_ids: Optional[List[int]] = None
+    target_words: int = 20000
+    k: int = 25
+    initial_k: int = 24
+
+
+def _job_id(spec: dict) -> str:
+    if spec.get("id"):
+        return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(spec["id"])).strip("_")
+    key = json.dumps(
+        {f: spec.get(f) for f in ("topic", "doc_ids", "doc_names", "target_words", "k")},
+        sort_keys=True,
+    )
+    slug = re.sub(r"[^a-z0-9]+", "_", spec["topic"].lower()).strip("_")[:40]
+    return f"{slug}_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}"
+
+
+def load_jobs(path: str) -> List[Job]:
+    catalog = None
+    jobs: List[Job] = []
+    seen_ids = {}
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            spec = json.loads(line)
+            if not spec.get("topic"):
+                raise ValueError(f"{path}:{line_no}: job is missing 'topic'")
+
+            # An explicitly empty scope is almost certainly a mistake; running it over
+            # every document would silently do something else
+            for field_name in ("doc_ids", "doc_names"):
+                if field_name in spec and spec[field_name] is not None and not spec[field_name]:
+                    raise ValueError(f"{path}:{line_no}: '{field_name}' is empty (omit it to use all documents)")
+
+            doc_ids = spec.get("doc_ids")
+            if doc_ids is None and spec.get("doc_names"):
+                if catalog is None:
+                    catalog = get_documents()
+                name_to_id = {name: doc_id for doc_id, name in catalog.items()}
+                unknown = [n for n in spec["doc_names"] if n not in name_to_id]
+                if unknown:
+                    raise ValueError(f"{path}:{line_no}: unknown documents {unknown}")
+                doc_ids = [name_to_id[n] for n in spec["doc_names"]]
+
+            # Jobs with the same id would write the same output files concurrently
+            job_id = _job_id(spec)
+            if job_id in seen_ids:
+                raise ValueError(f"{path}:{line_no}: duplicate job id '{job_id}' (first seen on line {seen_ids[job_id]})")
+            seen_ids[job_id] = line_no
+
+            jobs.append(Job(
+                job_id=job_id,
+                topic=spec["topic"],
+                doc_ids=[int(i) for i in doc_ids] if doc_ids else None,
+                target_words=int(spec.get("target_words", 20000)),
+                k=int(spec.get("k", 25)),
+                initial_k=int(spec.get("initial_k", 24)),
+            ))
+    return jobs
+
+
+class RetrievalCache:
+    """Thread-safe cache of build_context results shared by all jobs in a run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str, k: int, doc_ids: Optional[List[int]]):
+        key = (query.strip().lower(), k, tuple(sorted(doc_ids)) if doc_ids else None)
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                return self._data[key]
+        # Computed outside the lock; two jobs racing on one key just both fetch
+        value = build_context(query, k=k, filter_doc_ids=doc_ids)
+        with self._lock:
+            self.misses += 1
+            self._data[key] = value
+        return value
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def is_done(job: Job, out_dir: str) -> bool:
+    meta_path = os.path.join(out_dir, f"{job.job_id}.json")
+    if not os.path.exists(os.path.join(out_dir, f"{job.job_id}.md")) or not os.path.exists(meta_path):
+        return False
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f).get("status") == "ok"
+    except (OSError, ValueError):
+        return False
+
+
+def _load_manifest(path: str) -> Optional[HandbookManifest]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return HandbookManifest.from_dict(json.load(f))
+
+
+def run_job(job: Job, writer: LongWriter, cache: RetrievalCache, out_dir: str, regenerate: bool = False) -> dict:
+    timing = {"retrieval_s": 0.0, "retrieval_calls": 0}
+    started = time.perf_counter()
+    manifest_path = os.path.join(out_dir, f"{job.job_id}.manifest.json")
+
+    def retrieve(query: str, k: int):
+        t0 = time.perf_counter()
+        ctx, rows = cache.get(query, k, job.doc_ids)
+        timing["retrieval_s"] += time.perf_counter() - t0
+        timing["retrieval_calls"] += 1
+        return ctx, rows
+
+    meta = {"job": asdict(job), "status": "ok"}
+    try:
+        # Outline from document summaries when the scope is small enough;
+        # one summary call at a time so --concurrency still caps LLM calls
+        initial, _ = build_overview_context(writer.llm, job.doc_ids, max_workers=1)
+        if not initial:
+            initial, _ = retrieve(job.topic, job.initial_k)
+        if not initial.strip():
+            raise RuntimeError("No context found for the job scope")
+
+        previous = _load_manifest(manifest_path) if regenerate else None
+        handbook_md, manifest = writer.generate_handbook_with_manifest(
+            topic=job.topic,
+            initial_sources_text=initial,
+            retrieve_sources_for_section=retrieve,
+            target_words=job.target_words,
+            per_section_k=job.k,
+            previous=previous,
+        )
+        _write_atomic(os.path.join(out_dir, f"{job.job_id}.md"), handbook_md)
+        _write_atomic(manifest_path, json.dumps(manifest.to_dict(), indent=2))
+        meta["words"] = len(handbook_md.split())
+        meta["sections"] = len(manifest.sections)
+        meta["sections_reused"] = sum(1 for sec in manifest.sections if sec.reused)
+    except Exception as e:
+        meta["status"] = "error"
+        meta["error"] = f"{type(e).__name__}: {e}"
+
+    total = time.perf_counter() - started
+    meta["timing"] = {
+        "total_s": round(total, 2),
+        "retrieval_s": round(timing["retrieval_s"], 2),
+        "generation_s": round(total - timing["retrieval_s"], 2),
+        "retrieval_calls": timing["retrieval_calls"],
+    }
+    _write_atomic(os.path.join(out_dir, f"{job.job_id}.json"), json.dumps(meta, indent=2))
+    return meta
+
+
+def run_batch(jobs: List[Job], out_dir: str, concurrency: int = 2, regenerate: bool = False) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+
+    pending = jobs if regenerate else [j for j in jobs if not is_done(j, out_dir)]
+    skipped = [j.job_id for j in jobs if j not in pending]
+    for job_id in skipped:
+        print(f"[skip] {job_id} already completed")
+
+    writer = LongWriter()
+    cache = RetrievalCache()
+    results = []
+    started = time.perf_counter()
+
+    # One LongWriter call chain per worker, so this caps concurrent LLM calls too
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(run_job, j, writer, cache, out_dir, regenerate): j for j in pending}
+        for fut in as_completed(futures):
+            meta = fut.result()
+            results.append(meta)
+            job_id = meta["job"]["job_id"]
+            if meta["status"] == "ok":
+                print(f"[done] {job_id}: {meta['words']:,} words in {meta['timing']['total_s']}s")
+            else:
+                print(f"[fail] {job_id}: {meta['error']}")
+
+    report = {
+        "wall_s": round(time.perf_counter() - started, 2),
+        "concurrency": concurrency,
+        "completed": [m["job"]["job_id"] for m in results if m["status"] == "ok"],
+        "failed": [m["job"]["job_id"] for m in results if m["status"] != "ok"],
+        "skipped": skipped,
+        "retrieval_cache": {"hits": cache.hits, "misses": cache.misses},
+        "model_routes": writer.llm.route_stats(),
+        "jobs": results,
+    }
+    _write_atomic(os.path.join(out_dir, "report.json"), json.dumps(report, indent=2))
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate handbooks from a JSONL file of jobs.")
+    parser.add_argument("jobs", help="Path to the jobs JSONL file")
+    parser.add_argument("--out", default="handbooks", help="Output directory (default: handbooks)")
+    parser.add_argument("--concurrency", type=int, default=2, help="Max jobs running at once (default: 2)")
+    parser.add_argument(
+        "--regenerate",
+        action="store_true",
+        help="Rerun completed jobs, rewriting only sections whose sources changed",
+    )
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    report = run_batch(load_jobs(args.jobs), args.out, concurrency=args.concurrency, regenerate=args.regenerate)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
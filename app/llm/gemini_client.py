@@ -1,21 +1,26 @@
 import os
-from urllib import response
+from typing import Optional
 from google import genai
 
+from .routing import ModelRouter, get_router
+
 class GeminiClient:
-    def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise RuntimeError("Missing GEMINI_API_KEY in .env")
+    def __init__(self, client=None, router: Optional[ModelRouter] = None):
+        if client is None:
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise RuntimeError("Missing GEMINI_API_KEY in .env")
+            client = genai.Client(api_key=api_key)
 
-        self.client = genai.Client(api_key=api_key)
-        self.model = os.getenv("GEMINI_CHAT_MODEL", "gemini-1.5-pro")
+        self.client = client
+        self.router = router or get_router()
 
     def chat(
         self,
         messages: list[dict],
         temperature: float = 0.2,
-        max_tokens: int = 1000,
+        max_tokens: Optional[int] = None,
+        route: str = "default",
     ):
         """
         messages format:
@@ -23,6 +28,10 @@ class GeminiClient:
           {"role":"system","content":"..."},
           {"role":"user","content":"..."}
         ]
+
+        route tags the call's purpose (chat, outline, section, repair, appendix,
+        summary); it selects the model, default max_tokens and timeout, with
+        fallback to the fast model on timeout or quota errors.
         """
 
         # Flatten conversation into prompt text
@@ -31,13 +40,19 @@ class GeminiClient:
             role = m["role"].upper()
             prompt += f"{role}: {m['content']}\n"
 
-        resp = self.client.models.generate_content(
-            model=self.model,
-            contents=prompt,
-            config={
-                "temperature": temperature,
-                "max_output_tokens": max_tokens,
-            },
-        )
+        def generate(model: str, budget: int, timeout_s: float) -> str:
+            resp = self.client.models.generate_content(
+                model=model,
+                contents=prompt,
+                config={
+                    "temperature": temperature,
+                    "max_output_tokens": budget,
+                    "http_options": {"timeout": int(timeout_s * 1000)},
+                },
+            )
+            return resp.text or ""
+
+        return self.router.call(route, generate, max_tokens=max_tokens)
 
-        return resp.text or ""
\ No newline at end of file
+    def route_stats(self) -> dict:
+        return self.router.stats()
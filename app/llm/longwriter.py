@@ -1,5 +1,6 @@
-from dataclasses import dataclass
-from typing import List, Callable, Optional, Dict
+from dataclasses import dataclass, field, asdict
+from typing import List, Callable, Optional, Dict, Tuple, Union
+import hashlib
 import re
 
 from .gemini_client import GeminiClient
@@ -13,6 +14,72 @@ class SourceChunk:
     content: str
 
 
+@dataclass
+class SectionRecord:
+    title: str
+    prompt_hash: str
+    chunk_ids: List[str]
+    text: str
+    reused: bool = False
+
+
+@dataclass
+class HandbookManifest:
+    """What each section was generated from, so a later run can reuse unchanged sections."""
+    topic: str
+    outline: str
+    sections: List[SectionRecord] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HandbookManifest":
+        return cls(
+            topic=data["topic"],
+            outline=data["outline"],
+            sections=[SectionRecord(**s) for s in data.get("sections", [])],
+        )
+
+
+# A retriever returns either the sources text, or (sources_text, rows) so chunk ids can be recorded
+Retriever = Callable[[str, int], Union[str, Tuple[str, List[dict]]]]
+
+
+def _retrieve(fn: Retriever, query: str, k: int) -> Tuple[str, List[str]]:
+    out = fn(query, k)
+    if isinstance(out, tuple):
+        text, rows = out
+        return text, [f"{r['document_id']}:{r['chunk_index']}" for r in rows]
+    return out, []
+
+
+def content_hash(*parts: str) -> str:
+    """sha256 over NUL-separated parts; used for section and summary fingerprints."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def topic_key(topic: str) -> str:
+    """Case- and whitespace-insensitive form of a topic, for matching runs of the same handbook."""
+    return " ".join(topic.lower().split())
+
+
+def _section_hash(*plan: str, sources_text: str, chunk_ids: List[str]) -> str:
+    """
+    Fingerprint of a section's inputs. With chunk ids this is the plan plus
+    the *set* of source chunks, so a new ranking or truncation of the same
+    chunks (e.g. after BM25 scores shift) does not force a rewrite; retrievers
+    that return only text fall back to hashing the text.
+    """
+    if chunk_ids:
+        return content_hash(*plan, *sorted(set(chunk_ids)))
+    return content_hash(*plan, sources_text)
+
+
 def format_sources(chunks: List[SourceChunk], limit_chars: int = 12000) -> str:
     out = []
     total = 0
@@ -75,8 +142,8 @@ def _extract_section_titles(outline_md: str) -> List[str]:
 
 
 class LongWriter:
-    def __init__(self):
-        self.llm = GeminiClient()
+    def __init__(self, llm: Optional[GeminiClient] = None):
+        self.llm = llm or GeminiClient()
 
     def make_outline(self, topic: str, sources_text: str) -> str:
         messages = [
@@ -86,15 +153,15 @@ class LongWriter:
                 "content": f"{HANDBOOK_PLANNER}\n\nTopic: {topic}\n\nSources:\n{sources_text}\n\nOutput Markdown."
             },
         ]
-        return self.llm.chat(messages, temperature=0.2, max_tokens=1800)
+        return self.llm.chat(messages, temperature=0.2, route="outline")
 
     def generate_handbook(
         self,
         topic: str,
         initial_sources_text: str,
-        retrieve_sources_for_section: Callable[[str, int], str],
+        retrieve_sources_for_section: Retriever,
         target_words: int = 20000,
-        section_token_budget: int = 3500,
+        section_token_budget: Optional[int] = None,
         per_section_k: int = 25,
     ) -> str:
         """
@@ -102,11 +169,49 @@ class LongWriter:
         - Build outline once using initial_sources_text
         - Parse outline into ordered section titles
         - For each title, retrieve fresh sources and write that section
+        section_token_budget overrides the section/repair/appendix route
+        budgets (GEMINI_TOKENS_<ROUTE>) when given.
         """
-
-        outline = self.make_outline(topic, initial_sources_text)
+        handbook_md, _ = self.generate_handbook_with_manifest(
+            topic=topic,
+            initial_sources_text=initial_sources_text,
+            retrieve_sources_for_section=retrieve_sources_for_section,
+            target_words=target_words,
+            section_token_budget=section_token_budget,
+            per_section_k=per_section_k,
+        )
+        return handbook_md
+
+    def generate_handbook_with_manifest(
+        self,
+        topic: str,
+        initial_sources_text: str,
+        retrieve_sources_for_section: Retriever,
+        target_words: int = 20000,
+        section_token_budget: Optional[int] = None,
+        per_section_k: int = 25,
+        previous: Optional[HandbookManifest] = None,
+        replan: bool = False,
+    ) -> Tuple[str, HandbookManifest]:
+        """
+        Same as generate_handbook, but also returns the manifest. Pass the
+        manifest of an earlier run as `previous` for an incremental rebuild:
+        retrieval is redone for every section, but the LLM is only called for
+        sections whose sources or plan changed. The previous outline is kept
+        unless the topic changed or replan=True.
+        """
+        if previous is not None and topic_key(previous.topic) == topic_key(topic) and not replan:
+            outline = previous.outline
+        else:
+            outline = self.make_outline(topic, initial_sources_text)
         section_titles = _extract_section_titles(outline)
 
+        # A section is reused when its title and prompt inputs (plan + sources) are unchanged
+        reusable: Dict[Tuple[str, str], str] = {}
+        if previous is not None:
+            reusable = {(r.title, r.prompt_hash): r.text for r in previous.sections}
+        manifest = HandbookManifest(topic=topic, outline=outline)
+
         handbook_parts: List[str] = []
         handbook_parts.append(f"# Handbook: {topic}\n\n")
         handbook_parts.append("## Table of Contents + Plan\n\n")
@@ -136,7 +241,23 @@ class LongWriter:
                 break
 
             # Retrieve section-specific sources (this improves citations massively)
-            sources_text = retrieve_sources_for_section(title, per_section_k)
+            sources_text, chunk_ids = _retrieve(retrieve_sources_for_section, title, per_section_k)
+
+            # Rolling tail is left out on purpose so one changed section does not invalidate all later ones
+            prompt_hash = _section_hash(
+                SECTION_WRITER, topic_key(topic), outline, title, sources_text=sources_text, chunk_ids=chunk_ids
+            )
+            if (title, prompt_hash) in reusable:
+                section = reusable[(title, prompt_hash)]
+                manifest.sections.append(SectionRecord(title, prompt_hash, chunk_ids, section, reused=True))
+
+                handbook_parts.append(f"## {title}\n\n")
+                handbook_parts.append(section.strip())
+                handbook_parts.append("\n\n---\n\n")
+
+                rolling_tail = (rolling_tail + "\n" + section)[-12000:]
+                current_words += len(section.split())
+                continue
 
             prompt = (
                 f"{SECTION_WRITER}\n\n"
@@ -153,7 +274,7 @@ class LongWriter:
                 {"role": "user", "content": prompt},
             ]
 
-            section = self.llm.chat(messages,temperature=0.25,max_tokens=section_token_budget
+            section = self.llm.chat(messages,temperature=0.25,max_tokens=section_token_budget,route="section"
 )
 
             # Guard against None or empty responses
@@ -177,8 +298,11 @@ class LongWriter:
                      {"role": "user", "content": repair_prompt}],
                     temperature=0.25,
                     max_tokens=section_token_budget,
+                    route="repair",
                 )
 
+            manifest.sections.append(SectionRecord(title, prompt_hash, chunk_ids, section))
+
             handbook_parts.append(f"## {title}\n\n")
             handbook_parts.append(section.strip())
             handbook_parts.append("\n\n---\n\n")
@@ -190,7 +314,18 @@ class LongWriter:
         appendix_round = 1
         while current_words < target_words:
             title = f"Appendix {appendix_round}: Practical Templates and Checklists"
-            sources_text = retrieve_sources_for_section("templates checklists examples", per_section_k)
+            sources_text, chunk_ids = _retrieve(
+                retrieve_sources_for_section, "templates checklists examples", per_section_k
+            )
+            prompt_hash = _section_hash(
+                SECTION_WRITER, topic_key(topic), title, sources_text=sources_text, chunk_ids=chunk_ids
+            )
+
+            if (title, prompt_hash) in reusable:
+                section = reusable[(title, prompt_hash)]
+                manifest.sections.append(SectionRecord(title, prompt_hash, chunk_ids, section, reused=True))
+            else:
+                section = None
 
             prompt = (
                 f"{SECTION_WRITER}\n\n"
@@ -201,12 +336,15 @@ class LongWriter:
                 f"Add new material (no repetition)."
             )
 
-            section = self.llm.chat(
-                [{"role": "system", "content": "Write clean Markdown, very practical."},
-                 {"role": "user", "content": prompt}],
-                temperature=0.25,
-                max_tokens=section_token_budget,
-            )
+            if section is None:
+                section = self.llm.chat(
+                    [{"role": "system", "content": "Write clean Markdown, very practical."},
+                     {"role": "user", "content": prompt}],
+                    temperature=0.25,
+                    max_tokens=section_token_budget,
+                    route="appendix",
+                )
+                manifest.sections.append(SectionRecord(title, prompt_hash, chunk_ids, section))
 
             handbook_parts.append(f"## {title}\n\n")
             handbook_parts.append(section.strip())
@@ -219,4 +357,4 @@ class LongWriter:
             if appendix_round > 30:  # safety stop
                 break
 
-        return "".join(handbook_parts)
\ No newline at end of file
+        return "".join(handbook_parts), manifest
\ No newline at end of file
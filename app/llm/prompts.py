@@ -57,4 +57,23 @@ If the Sources block does not contain enough information to write the section:
 - Say what is missing in 2-3 sentences
 - Provide a short outline anyway
 - Do NOT fabricate details
-"""
\ No newline at end of file
+"""
+
+SECTION_SUMMARY = """Summarize the following consecutive excerpts from one document.
+
+Rules:
+- Use ONLY the excerpts. Do not add outside knowledge.
+- 80 to 150 words, plain prose, no headings.
+- Keep key terms, names, numbers, methods and findings.
+- Do not mention "the excerpts" or "this section".
+"""
+
+
+DOCUMENT_SUMMARY = """Write a document-level summary from the section summaries below (in document order).
+
+Rules:
+- Use ONLY the section summaries.
+- 150 to 300 words.
+- Cover purpose/thesis, approach or methodology, main results, and conclusions where present.
+- Plain prose, no headings.
+"""
@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+# Call purposes used across the app. Each maps to a model, a default token
+# budget and a timeout; any of them can be overridden per route with
+# GEMINI_MODEL_<ROUTE>, GEMINI_TOKENS_<ROUTE> and GEMINI_TIMEOUT_<ROUTE>.
+ROUTES = ("default", "chat", "outline", "section", "repair", "appendix", "summary")
+
+# Errors worth retrying on a faster model: timeouts, quota and overload
+_FALLBACK_CODES = {408, 429, 499, 500, 503, 504}
+_FALLBACK_MARKERS = ("resource_exhausted", "deadline_exceeded", "unavailable", "timed out", "timeout", "quota")
+
+
+@dataclass
+class Route:
+    model: str
+    max_tokens: int
+    timeout_s: float
+    fallback_model: Optional[str] = None
+
+
+def default_routes() -> Dict[str, Route]:
+    main = os.getenv("GEMINI_CHAT_MODEL", "gemini-1.5-pro")
+    fast = os.getenv("GEMINI_FAST_MODEL", "gemini-1.5-flash")
+
+    # (model, max_tokens, timeout_s)
+    base = {
+        "default": (main, 1000, 120),
+        "chat": (main, 1500, 60),
+        "outline": (main, 1800, 120),
+        "section": (main, 3500, 180),
+        "repair": (fast, 3500, 120),
+        "appendix": (fast, 3500, 120),
+        "summary": (fast, 700, 60),
+    }
+
+    routes = {}
+    for name, (model, max_tokens, timeout_s) in base.items():
+        key = name.upper()
+        routes[name] = Route(
+            model=os.getenv(f"GEMINI_MODEL_{key}", model),
+            max_tokens=int(os.getenv(f"GEMINI_TOKENS_{key}", max_tokens)),
+            timeout_s=float(os.getenv(f"GEMINI_TIMEOUT_{key}", timeout_s)),
+            fallback_model=fast,
+        )
+    return routes
+
+
+def is_fallback_error(exc: Exception) -> bool:
+    if isinstance(exc, TimeoutError) or "timeout" in type(exc).__name__.lower():
+        return True
+    if getattr(exc, "code", None) in _FALLBACK_CODES:
+        return True
+    text = f"{getattr(exc, 'status', '')} {exc}".lower()
+    return any(m in text for m in _FALLBACK_MARKERS)
+
+
+class ModelRouter:
+    """Picks model and budget per call purpose, falls back on timeout/quota, records latency."""
+
+    def __init__(self, routes: Optional[Dict[str, Route]] = None, window: int = 500):
+        self.routes = routes if routes is not None else default_routes()
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=window))  # (route, model) -> seconds
+        self._counts = defaultdict(lambda: {"calls": 0, "errors": 0, "fallbacks": 0})
+
+    def route(self, name: str) -> Route:
+        return self.routes.get(name) or self.routes["default"]
+
+    def _record(self, name: str, model: str, seconds: float, error: bool = False, fallback: bool = False) -> None:
+        with self._lock:
+            counts = self._counts[(name, model)]
+            counts["calls"] += 1
+            counts["errors"] += int(error)
+            counts["fallbacks"] += int(fallback)
+            if not error:
+                self._latencies[(name, model)].append(seconds)
+
+    def call(self, name: str, fn: Callable[[str, int, float], str], max_tokens: Optional[int] = None) -> str:
+        """Run fn(model, max_tokens, timeout_s) for the route, retrying once on the fallback model."""
+        route = self.route(name)
+        budget = max_tokens or route.max_tokens
+
+        t0 = time.perf_counter()
+        try:
+            out = fn(route.model, budget, route.timeout_s)
+        except Exception as e:
+            self._record(name, route.model, time.perf_counter() - t0, error=True)
+            if not route.fallback_model or route.fallback_model == route.model or not is_fallback_error(e):
+                raise
+        else:
+            self._record(name, route.model, time.perf_counter() - t0)
+            return out
+
+        t0 = time.perf_counter()
+        try:
+            out = fn(route.fallback_model, budget, route.timeout_s)
+        except Exception:
+            self._record(name, route.fallback_model, time.perf_counter() - t0, error=True, fallback=True)
+            raise
+        self._record(name, route.fallback_model, time.perf_counter() - t0, fallback=True)
+        return out
+
+    def stats(self) -> Dict[str, Dict[str, dict]]:
+        """{route: {model: {calls, errors, fallbacks, mean_s, p50_s, p95_s}}}"""
+        out: Dict[str, Dict[str, dict]] = defaultdict(dict)
+        with self._lock:
+            for (name, model), counts in self._counts.items():
+                lat = sorted(self._latencies[(name, model)])
+                entry = dict(counts)
+                if lat:
+                    entry["mean_s"] = round(sum(lat) / len(lat), 3)
+                    entry["p50_s"] = round(lat[len(lat) // 2], 3)
+                    entry["p95_s"] = round(lat[min(len(lat) - 1, int(len(lat) * 0.95))], 3)
+                out[name][model] = entry
+        return dict(out)
+
+
+# Shared by every GeminiClient in the process so stats cover UI, writer and batch calls
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter()
+        return _router
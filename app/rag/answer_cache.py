@@ -0,0 +1,138 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from .doc_catalog import get_documents
+
+
+def scope_key(doc_ids) -> str:
+    return "all" if doc_ids is None else ",".join(str(i) for i in sorted(int(d) for d in doc_ids))
+
+
+def scope_signature(doc_ids) -> str:
+    """Fingerprint of the documents currently in scope; changes when one is added or removed."""
+    docs = get_documents()
+    ids = sorted(docs) if doc_ids is None else sorted(int(d) for d in doc_ids if int(d) in docs)
+    return hashlib.sha1(",".join(f"{i}:{docs[i]}" for i in ids).encode("utf-8")).hexdigest()
+
+
+def _scope_hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "little", signed=True)
+
+
+# The grounded chat prompt's "not in the context" reply; caching it would
+# hand the same refusal to every near-duplicate question
+_REFUSAL_MARKERS = ("i couldn't find that in the indexed pdfs", "i couldn’t find that in the indexed pdfs")
+
+
+def is_refusal(answer: str) -> bool:
+    text = (answer or "").strip().lower()
+    return not text or any(m in text for m in _REFUSAL_MARKERS)
+
+
+class SemanticAnswerCache:
+    """
+    LRU cache of chat answers keyed by query embedding and document scope.
+
+    Cached query vectors live in one preallocated matrix, so a lookup is a
+    single masked matrix-vector product over the entries of the same scope.
+    """
+
+    def __init__(self, max_entries: int = 256, threshold: float = 0.9):
+        self.max_entries = int(max_entries)
+        self.threshold = float(threshold)
+        self._lock = threading.Lock()
+        self._vecs: Optional[np.ndarray] = None  # (max_entries, dim), rows L2-normalized
+        self._scopes = np.zeros(self.max_entries, dtype=np.int64)
+        self._signatures = np.zeros(self.max_entries, dtype=np.int64)
+        self._used = np.zeros(self.max_entries, dtype=bool)
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()  # slot -> entry, oldest first
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(vec) -> np.ndarray:
+        v = np.asarray(vec, dtype=np.float32)
+        return v / max(float(np.linalg.norm(v)), 1e-12)
+
+    def _evict(self, slot: int) -> None:
+        self._used[slot] = False
+        self._entries.pop(slot, None)
+
+    def lookup(self, query_embedding, doc_ids, signature: str) -> Optional[dict]:
+        """Return the cached entry (question, answer, similarity) or None."""
+        q = self._normalize(query_embedding)
+        with self._lock:
+            if self._vecs is None or self._vecs.shape[1] != q.shape[0]:
+                self.misses += 1
+                return None
+
+            in_scope = self._used & (self._scopes == _scope_hash(scope_key(doc_ids)))
+            current = self._signatures == _scope_hash(signature)
+            # Documents in scope changed since these answers were produced
+            for stale in np.flatnonzero(in_scope & ~current):
+                self._evict(int(stale))
+
+            slots = np.flatnonzero(in_scope & current)
+            if slots.size == 0:
+                self.misses += 1
+                return None
+
+            sims = self._vecs[slots] @ q
+            best = int(np.argmax(sims))
+            slot, sim = int(slots[best]), float(sims[best])
+            if sim < self.threshold:
+                self.misses += 1
+                return None
+
+            entry = self._entries[slot]
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return {"question": entry["question"], "answer": entry["answer"], "similarity": sim}
+
+    def store(self, query_embedding, question: str, answer: str, doc_ids, signature: str) -> None:
+        """Cache an answer; empty answers and refusals are not stored."""
+        if is_refusal(answer):
+            return
+        q = self._normalize(query_embedding)
+        with self._lock:
+            if self._vecs is None or self._vecs.shape[1] != q.shape[0]:
+                self._vecs = np.zeros((self.max_entries, q.shape[0]), dtype=np.float32)
+                self._used[:] = False
+                self._entries.clear()
+
+            free = np.flatnonzero(~self._used)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot, _ = self._entries.popitem(last=False)  # least recently used
+
+            self._vecs[slot] = q
+            self._scopes[slot] = _scope_hash(scope_key(doc_ids))
+            self._signatures[slot] = _scope_hash(signature)
+            self._used[slot] = True
+            self._entries[slot] = {"question": question, "answer": answer}
+            self._entries.move_to_end(slot)
+
+
+# Shared by all Streamlit sessions in the process
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SemanticAnswerCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticAnswerCache(
+                max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "256")),
+                threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.9")),
+            )
+        return _cache
@@ -0,0 +1,86 @@
+import os
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from . import lexical
+from .doc_catalog import doc_names, get_documents
+from .embeddings_gemini import embed_query
+from .supabase_rest import match_chunks
+from ..llm.longwriter import SourceChunk, format_sources
+
+
+@lru_cache(maxsize=4096)
+def _embed_query_cached(text: str) -> tuple:
+    return tuple(embed_query(text))
+
+
+def embed_query_cached(text: str) -> list[float]:
+    """embed_query with a process-wide LRU cache (repeated section titles, appendix queries, ...)."""
+    return list(_embed_query_cached(text))
+
+
+def lexical_search(query: str, k: int = 16, filter_doc_ids=None) -> Tuple[List[dict], bool]:
+    """BM25 rows and whether they are confident enough to skip vector search."""
+    if os.getenv("LEXICAL_SEARCH", "1") != "1":
+        return [], False
+    lexical.ensure_documents(doc_names(filter_doc_ids) if filter_doc_ids is not None else get_documents())
+    return lexical.search(query, k=k, filter_document_ids=filter_doc_ids)
+
+
+def build_context(
+    query: str,
+    k: int = 16,
+    filter_doc_ids=None,
+    query_embedding: Optional[list] = None,
+    lexical_result: Optional[Tuple[List[dict], bool]] = None,
+) -> Tuple[str, List[dict]]:
+    """
+    Retrieve, deduplicate and format sources for a query.
+    Returns (sources_text, rows); ("", []) when nothing matched.
+
+    A confident BM25 hit (short exact-term query) answers without calling the
+    embedding API; otherwise vector and lexical results are fused with RRF.
+    Callers that already ran lexical_search or embedded the query can pass
+    the results in so neither is repeated.
+    """
+    if lexical_result is None:
+        lexical_result = lexical_search(query, k=k, filter_doc_ids=filter_doc_ids)
+    lexical_rows, confident = lexical_result
+
+    if confident:
+        results = lexical_rows
+    else:
+        q_emb = query_embedding if query_embedding is not None else embed_query_cached(query)
+
+        # Use plural to support lists
+        results = match_chunks(q_emb, match_count=k, filter_document_ids=filter_doc_ids)
+        if lexical_rows:
+            results = lexical.rrf_fuse([results or [], lexical_rows], k=k)
+
+    # Return early if retrieval fails or scope is completely empty
+    if not results:
+        return "", []
+
+    unique = []
+    seen = set()
+    for r in results:
+        key = (r["content"][:140] if r.get("content") else "").strip().lower()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        unique.append(r)
+
+    results = unique[:k]
+
+    src_chunks = [
+        SourceChunk(
+            doc_name=r["doc_name"],
+            chunk_index=r["chunk_index"],
+            content=r["content"],
+        )
+        for r in results
+    ]
+
+    # Dynamically scale limit_chars based on 'k' so we don't truncate large retrievals
+    dynamic_limit = k * 1500
+    return format_sources(src_chunks, limit_chars=dynamic_limit), results
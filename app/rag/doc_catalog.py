@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+# Process-wide cache of the documents table (document_id -> doc_name).
+# Streamlit runs every browser session in the same process, so one catalog
+# is shared by all sessions and survives page reloads.
+_lock = threading.Lock()
+_docs: Dict[int, str] = {}
+_etag: Optional[str] = None
+_loaded_at: float = 0.0
+_loaded = False
+_missing: Dict[int, float] = {}  # id -> when a forced refresh last failed to find it
+
+
+def _ttl() -> float:
+    return float(os.getenv("DOC_CATALOG_TTL", "300"))
+
+
+def _refresh(force: bool = False) -> None:
+    """Load or revalidate the catalog. Caller must hold _lock."""
+    global _docs, _etag, _loaded_at, _loaded
+
+    if _loaded and not force and time.monotonic() - _loaded_at < _ttl():
+        return
+
+    from .supabase_rest import fetch_documents
+
+    rows, etag = fetch_documents(etag=_etag if _loaded else None)
+    if rows is not None:
+        # Full reload (first load, changed ETag or server without ETag support)
+        _docs = {int(r["id"]): r["doc_name"] for r in rows}
+        _etag = etag
+    # rows is None -> 304 Not Modified, keep current entries
+
+    _loaded_at = time.monotonic()
+    _loaded = True
+
+
+def get_documents(force: bool = False) -> Dict[int, str]:
+    """Return a copy of {document_id: doc_name} for every stored document."""
+    with _lock:
+        _refresh(force=force)
+        return dict(_docs)
+
+
+def add_document(doc_id: int, doc_name: str) -> None:
+    """Record a newly inserted document without reloading the whole table."""
+    global _etag
+    with _lock:
+        _docs[int(doc_id)] = doc_name
+        _missing.pop(int(doc_id), None)
+        # Our copy is now ahead of the server's last ETag; drop it so the next
+        # revalidation does a full fetch instead of trusting a stale 304.
+        _etag = None
+
+
+def doc_names(doc_ids: Iterable[int]) -> Dict[int, str]:
+    """
+    Resolve many ids at once. Triggers at most one forced refresh when some
+    ids are unknown (e.g. documents inserted by another process); ids still
+    unknown after it are not refetched again until the TTL expires. Unknown
+    ids, and all ids when the catalog cannot be loaded, resolve to "doc_<id>".
+    """
+    ids = {int(i) for i in doc_ids}
+    with _lock:
+        try:
+            _refresh()
+            now = time.monotonic()
+            unknown = [i for i in ids if i not in _docs and now - _missing.get(i, float("-inf")) >= _ttl()]
+            if unknown:
+                _refresh(force=True)
+                for i in unknown:
+                    if i not in _docs:
+                        _missing[i] = now
+        except Exception:
+            # Names are cosmetic; a catalog outage must not fail retrieval
+            pass
+        return {i: _docs.get(i, f"doc_{i}") for i in ids}
+
+
+def doc_name(doc_id: int) -> str:
+    return doc_names([doc_id])[int(doc_id)]
+
+
+def invalidate() -> None:
+    global _loaded
+    with _lock:
+        _loaded = False
+        _missing.clear()
+_missing: Dict[int, float] = {}  # id -> when a forced refresh last failed to find it
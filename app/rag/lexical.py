@@ -0,0 +1,251 @@
+import gzip
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .supabase_rest import fetch_chunks
+
+# Keeps "3.2.1", "gpt-4" and "pgvector" as single tokens
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-_][a-z0-9]+)*")
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "its", "me", "of", "on", "or", "that", "the", "this",
+    "to", "was", "what", "when", "where", "which", "who", "why", "with", "about", "tell",
+    "explain", "describe", "show", "give", "there", "their", "these", "those",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+# No single quotes: apostrophes ("what's") would open a quote
+_QUOTED_RE = re.compile(r"[\"`“”]([^\"`“”]+)[\"`“”]")
+_ACRONYM_RE = re.compile(r"\b[A-Z][A-Z0-9]+s?\b")
+
+
+def exact_terms(query: str) -> List[str]:
+    """
+    Query terms shaped like exact lookups: anything with a digit ("3.2.1",
+    "gpt-4", "429"), acronyms ("HNSW", "RRF") and quoted terms. Plain words
+    ("dropout", "transformer") are conceptual and not returned.
+    """
+    query = query or ""
+    found = [t for t in tokenize(query) if any(ch.isdigit() for ch in t)]
+    if not (query.isupper() and len(query.split()) > 1):  # an all-caps sentence is shouting, not acronyms
+        found += tokenize(" ".join(_ACRONYM_RE.findall(query)))
+    for phrase in _QUOTED_RE.findall(query):
+        found += tokenize(phrase)
+    return list(dict.fromkeys(found))
+
+
+class LexicalIndex:
+    """
+    In-process BM25 index over chunk text, built incrementally at ingest.
+
+    Only (document_id, chunk_index, content) and document names are persisted
+    (gzip JSON); postings are rebuilt when the file is loaded.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[int, str] = {}
+        self.chunks: List[Tuple[int, int, str]] = []
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._lengths: List[int] = []
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def has_document(self, document_id: int) -> bool:
+        return int(document_id) in self.docs
+
+    def add_document(self, document_id: int, doc_name: str, chunks: Iterable[dict], replace: bool = False) -> None:
+        document_id = int(document_id)
+        if document_id in self.docs:
+            if not replace:
+                return
+            self._remove_document(document_id)
+        self.docs[document_id] = doc_name
+        for ch in chunks:
+            self._add_chunk(document_id, int(ch["chunk_index"]), ch["content"])
+
+    def _remove_document(self, document_id: int) -> None:
+        # Postings are keyed by chunk position, so rebuild them from the remaining chunks
+        kept = [c for c in self.chunks if c[0] != document_id]
+        del self.docs[document_id]
+        self.chunks, self._lengths, self._total_len = [], [], 0
+        self._postings = defaultdict(dict)
+        for doc_id, chunk_index, content in kept:
+            self._add_chunk(doc_id, chunk_index, content)
+
+    def _add_chunk(self, document_id: int, chunk_index: int, content: str) -> None:
+        pos = len(self.chunks)
+        tokens = tokenize(content)
+        self.chunks.append((document_id, chunk_index, content))
+        self._lengths.append(len(tokens))
+        self._total_len += len(tokens)
+        for term, tf in Counter(tokens).items():
+            self._postings[term][pos] = tf
+
+    def idf(self, term: str) -> float:
+        n = len(self.chunks)
+        df = len(self._postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int = 16, filter_document_ids=None) -> List[dict]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.chunks:
+            return []
+
+        allowed = {int(i) for i in filter_document_ids} if filter_document_ids is not None else None
+        avg_len = self._total_len / len(self.chunks) or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        matched: Dict[int, int] = defaultdict(int)
+
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for pos, tf in postings.items():
+                if allowed is not None and self.chunks[pos][0] not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[pos] / avg_len)
+                scores[pos] += idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[pos] += 1
+
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        rows = []
+        for pos in best:
+            document_id, chunk_index, content = self.chunks[pos]
+            rows.append({
+                "document_id": document_id,
+                "doc_name": self.docs[document_id],
+                "chunk_index": chunk_index,
+                "content": content,
+                "bm25": round(scores[pos], 4),
+                "matched_terms": matched[pos],
+            })
+        return rows
+
+    def is_confident(self, query: str, rows: List[dict]) -> bool:
+        """
+        True for short exact-term lookups (section numbers, error codes,
+        acronyms, quoted terms): the query contains at least one such term,
+        has few terms overall, the top hit contains all of them, the terms are
+        rare enough to be discriminative, and the top hit clearly beats the
+        runner-up (a single hit counts). Conceptual questions ("What is dropout?") return False so
+        they go through embedding search.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        max_terms = int(os.getenv("LEXICAL_MAX_TERMS", "4"))
+        min_idf = float(os.getenv("LEXICAL_MIN_IDF", "2.0"))
+        min_rows = int(os.getenv("LEXICAL_MIN_ROWS", "1"))
+        min_margin = float(os.getenv("LEXICAL_MIN_MARGIN", "0.2"))
+        if not terms or len(terms) > max_terms or not exact_terms(query):
+            return False
+        if len(rows) < min_rows or rows[0]["matched_terms"] < len(terms):
+            return False
+        if len(rows) > 1 and rows[0]["bm25"] < rows[1]["bm25"] * (1 + min_margin):
+            return False
+        return sum(self.idf(t) for t in terms) / len(terms) >= min_idf
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = {
+            "version": 1,
+            "docs": {str(k): v for k, v in self.docs.items()},
+            "chunks": self.chunks,
+        }
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        index = cls()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        index.docs = {int(k): v for k, v in data["docs"].items()}
+        for document_id, chunk_index, content in data["chunks"]:
+            index._add_chunk(document_id, chunk_index, content)
+        return index
+
+
+def rrf_fuse(result_lists: List[List[dict]], k: int = 16, c: int = 60) -> List[dict]:
+    """Reciprocal rank fusion over rows keyed by (document_id, chunk_index)."""
+    fused: Dict[Tuple[int, int], float] = defaultdict(float)
+    first_row: Dict[Tuple[int, int], dict] = {}
+    for rows in result_lists:
+        for rank, r in enumerate(rows, start=1):
+            key = (int(r["document_id"]), int(r["chunk_index"]))
+            fused[key] += 1.0 / (c + rank)
+            first_row.setdefault(key, r)
+
+    out = []
+    for key in sorted(fused, key=fused.get, reverse=True)[:k]:
+        row = dict(first_row[key])
+        row["rrf"] = round(fused[key], 5)
+        out.append(row)
+    return out
+
+
+# Process-wide index, loaded lazily on first use
+_lock = threading.Lock()
+_index: Optional[LexicalIndex] = None
+
+
+def _path() -> str:
+    return os.getenv("LEXICAL_INDEX_PATH", os.path.join(".cache", "lexical_index.json.gz"))
+
+
+def get_index() -> LexicalIndex:
+    global _index
+    with _lock:
+        if _index is None:
+            path = _path()
+            _index = LexicalIndex.load(path) if os.path.exists(path) else LexicalIndex()
+        return _index
+
+
+def index_document(document_id: int, doc_name: str, chunks: List[dict]) -> None:
+    """Add (or replace) a freshly ingested document and persist the index."""
+    index = get_index()
+    with _lock:
+        index.add_document(document_id, doc_name, chunks, replace=True)
+        index.save(_path())
+
+
+def ensure_documents(docs: Dict[int, str]) -> None:
+    """Backfill documents ingested before the index existed (or by another process)."""
+    index = get_index()
+    missing = {i: n for i, n in docs.items() if not index.has_document(i)}
+    if not missing:
+        return
+
+    # A document with no chunks yet is still being ingested; registering it
+    # empty would hide it until the next restart, so leave it for later
+    fetched = {i: chunks for i in missing if (chunks := fetch_chunks(i))}
+    if not fetched:
+        return
+    with _lock:
+        for doc_id, chunks in fetched.items():
+            index.add_document(doc_id, missing[doc_id], chunks)
+        index.save(_path())
+
+
+def search(query: str, k: int = 16, filter_document_ids=None) -> Tuple[List[dict], bool]:
+    """Returns (rows, confident)."""
+    index = get_index()
+    with _lock:
+        rows = index.search(query, k=k, filter_document_ids=filter_document_ids)
+        return rows, index.is_confident(query, rows)
@@ -0,0 +1,194 @@
+import os
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Gemini embeddings are Matryoshka-trained: a prefix of the vector, renormalized,
+# is itself a usable (lower quality) embedding. The coarse stage scans quantized
+# prefixes; the survivors are reranked with the full float32 vectors.
+
+# Rows dequantized per step of the int8 scan; keeps the float32 scratch at ~1 MB
+_SCAN_BLOCK = 1024
+
+
+def normalize(vecs: np.ndarray) -> np.ndarray:
+    vecs = np.asarray(vecs, dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=-1, keepdims=True)
+    return vecs / np.maximum(norms, 1e-12)
+
+
+def truncate(vecs: np.ndarray, dim: int) -> np.ndarray:
+    """Matryoshka truncation: keep the first `dim` components and renormalize."""
+    return normalize(np.asarray(vecs, dtype=np.float32)[..., :dim])
+
+
+def quantize_int8(vecs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 quantization. Returns (codes, scales)."""
+    vecs = np.asarray(vecs, dtype=np.float32)
+    scales = np.maximum(np.abs(vecs).max(axis=-1), 1e-12) / 127.0
+    codes = np.clip(np.rint(vecs / scales[..., None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(vecs: np.ndarray) -> np.ndarray:
+    """Sign bits packed 8 per byte."""
+    return np.packbits(np.asarray(vecs) > 0, axis=-1)
+
+
+def hamming(codes: np.ndarray, query_bits: np.ndarray) -> np.ndarray:
+    # Popcount 64 bits at a time when the code width allows it
+    word = np.uint64 if codes.shape[-1] % 8 == 0 else np.uint8
+    codes = np.ascontiguousarray(codes).view(word)
+    query_bits = np.ascontiguousarray(query_bits).view(word)
+    return np.bitwise_count(np.bitwise_xor(codes, query_bits)).sum(axis=-1, dtype=np.int32)
+
+
+def int8_dot(codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Approximate dot products of int8-coded vectors with a float32 query.
+    Codes are converted in small blocks, so only the int8 codes stay resident.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    out = np.empty(len(codes), dtype=np.float32)
+    buf = np.empty((min(_SCAN_BLOCK, len(codes)), codes.shape[-1]), dtype=np.float32)
+    for start in range(0, len(codes), _SCAN_BLOCK):
+        block = codes[start : start + _SCAN_BLOCK]
+        np.copyto(buf[: len(block)], block, casting="unsafe")
+        np.matmul(buf[: len(block)], query, out=out[start : start + len(block)])
+    return out * scales
+
+
+class QuantizedIndex:
+    """
+    In-process two-stage vector index.
+
+    mode="int8":   coarse scan over int8 codes of the first `coarse_dim` dims
+    mode="binary": coarse scan over packed sign bits (Hamming distance)
+    mode="exact":  full float32 scan, for reference
+
+    Full vectors are only touched for the rerank stage; after save()/load()
+    they are memory-mapped, so resident memory is the coarse codes.
+    """
+
+    def __init__(self, coarse_dim: int = 256, mode: str = "int8", candidate_factor: int = 8):
+        if mode not in ("int8", "binary", "exact"):
+            raise ValueError(f"Unknown mode: {mode}")
+        self.coarse_dim = int(coarse_dim)
+        self.mode = mode
+        self.candidate_factor = int(candidate_factor)
+
+        self.keys: List[Hashable] = []
+        self._doc_ids = np.zeros(0, dtype=np.int64)
+        self._full: Optional[np.ndarray] = None
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, keys: Sequence[Hashable], embeddings, document_ids: Optional[Sequence[int]] = None) -> None:
+        full = normalize(embeddings)
+        if len(keys) != len(full):
+            raise ValueError("keys and embeddings must have the same length")
+        if document_ids is None:
+            document_ids = [-1] * len(keys)
+
+        coarse = truncate(full, self.coarse_dim)
+        if self.mode == "int8":
+            codes, scales = quantize_int8(coarse)
+        elif self.mode == "binary":
+            codes, scales = quantize_binary(coarse), None
+        else:
+            codes, scales = None, None
+
+        self.keys.extend(keys)
+        self._doc_ids = np.concatenate([self._doc_ids, np.asarray(document_ids, dtype=np.int64)])
+        self._full = full if self._full is None else np.concatenate([self._full, full])
+        if codes is not None:
+            self._codes = codes if self._codes is None else np.concatenate([self._codes, codes])
+        if scales is not None:
+            self._scales = scales if self._scales is None else np.concatenate([self._scales, scales])
+
+    def _coarse_scores(self, query: np.ndarray, rows) -> np.ndarray:
+        q = truncate(query, self.coarse_dim)
+        if self.mode == "int8":
+            return int8_dot(self._codes[rows], self._scales[rows], q)
+        # Higher is better, so negate the distance
+        return -hamming(self._codes[rows], quantize_binary(q)).astype(np.float32)
+
+    def search(
+        self,
+        query_embedding,
+        k: int = 8,
+        filter_document_ids: Optional[Sequence[int]] = None,
+        candidates: Optional[int] = None,
+    ) -> List[Tuple[Hashable, float]]:
+        """Return [(key, cosine_similarity)] for the top k, best first."""
+        if not self.keys:
+            return []
+
+        query = normalize(query_embedding)
+        if filter_document_ids is not None:
+            rows = np.flatnonzero(np.isin(self._doc_ids, np.asarray(list(filter_document_ids), dtype=np.int64)))
+            if rows.size == 0:
+                return []
+        else:
+            rows = None  # all rows, without copying
+
+        if self.mode != "exact":
+            n_rows = len(self.keys) if rows is None else rows.size
+            n_cand = min(n_rows, candidates or k * self.candidate_factor)
+            coarse = self._coarse_scores(query, slice(None) if rows is None else rows)
+            if n_cand < n_rows:
+                picked = np.argpartition(-coarse, n_cand - 1)[:n_cand]
+                rows = picked if rows is None else rows[picked]
+
+        if rows is None:
+            rows = np.arange(len(self.keys))
+            scores = np.asarray(self._full) @ query
+        else:
+            scores = np.asarray(self._full[rows]) @ query
+        top = min(k, rows.size)
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [(self.keys[rows[i]], float(scores[i])) for i in best]
+
+    def memory_per_chunk(self) -> dict:
+        """Bytes per chunk for the coarse stage and for the full-precision vectors."""
+        if self.mode == "int8":
+            coarse = self.coarse_dim + 4  # codes + float32 scale
+        elif self.mode == "binary":
+            coarse = (self.coarse_dim + 7) // 8
+        else:
+            coarse = 0
+        full = self._full.shape[1] * 4 if self._full is not None else 0
+        return {"coarse_bytes": coarse, "full_bytes": full}
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "full.npy"), np.asarray(self._full))
+        np.save(os.path.join(path, "doc_ids.npy"), self._doc_ids)
+        if self._codes is not None:
+            np.save(os.path.join(path, "codes.npy"), self._codes)
+        if self._scales is not None:
+            np.save(os.path.join(path, "scales.npy"), self._scales)
+        keys = np.empty(len(self.keys), dtype=object)
+        keys[:] = self.keys
+        np.save(os.path.join(path, "keys.npy"), keys, allow_pickle=True)
+        with open(os.path.join(path, "meta.txt"), "w", encoding="utf-8") as f:
+            f.write(f"{self.mode} {self.coarse_dim} {self.candidate_factor}\n")
+
+    @classmethod
+    def load(cls, path: str) -> "QuantizedIndex":
+        with open(os.path.join(path, "meta.txt"), encoding="utf-8") as f:
+            mode, coarse_dim, factor = f.read().split()
+        index = cls(coarse_dim=int(coarse_dim), mode=mode, candidate_factor=int(factor))
+        index.keys = list(np.load(os.path.join(path, "keys.npy"), allow_pickle=True))
+        index._doc_ids = np.load(os.path.join(path, "doc_ids.npy"))
+        # Full vectors stay on disk; only reranked rows are paged in
+        index._full = np.load(os.path.join(path, "full.npy"), mmap_mode="r")
+        if os.path.exists(os.path.join(path, "codes.npy")):
+            index._codes = np.load(os.path.join(path, "codes.npy"))
+        if os.path.exists(os.path.join(path, "scales.npy")):
+            index._scales = np.load(os.path.join(path, "scales.npy"))
+        return index
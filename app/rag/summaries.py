@@ -0,0 +1,261 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .doc_catalog import doc_names, get_documents
+from .supabase_rest import fetch_chunks, fetch_last_chunk_index, fetch_summaries, upsert_summaries
+from ..llm.longwriter import content_hash
+from ..llm.prompts import SECTION_SUMMARY, DOCUMENT_SUMMARY
+
+
+@dataclass
+class SectionSummary:
+    section_index: int
+    chunk_start: int
+    chunk_end: int
+    source_hash: str
+    content: str
+
+
+@dataclass
+class DocSummary:
+    document_id: int
+    doc_name: str
+    source_hash: str
+    content: str
+    sections: List[SectionSummary] = field(default_factory=list)
+
+
+# document_id -> DocSummary. Chunks are never edited after ingest, so an entry
+# stays valid until the document is re-summarized from its chunks at ingest.
+_lock = threading.Lock()
+_cache: Dict[int, DocSummary] = {}
+
+
+def _section_chunks() -> int:
+    return max(2, int(os.getenv("SUMMARY_SECTION_CHUNKS", "12")))
+
+
+def _summarize_section(llm, doc_name: str, chunks: List[dict]) -> str:
+    excerpts = "\n---\n".join(c["content"] for c in chunks)
+    messages = [
+        {"role": "system", "content": "You write faithful, compact summaries."},
+        {"role": "user", "content": f"{SECTION_SUMMARY}\n\nDocument: {doc_name}\n\nExcerpts:\n{excerpts}"},
+    ]
+    return (llm.chat(messages, temperature=0.1, route="summary") or "").strip()
+
+
+def _summarize_document(llm, doc_name: str, sections: List[SectionSummary]) -> str:
+    body = "\n\n".join(
+        f"(Chunks {s.chunk_start}-{s.chunk_end}) {s.content}" for s in sections
+    )
+    messages = [
+        {"role": "system", "content": "You write faithful, compact summaries."},
+        {"role": "user", "content": f"{DOCUMENT_SUMMARY}\n\nDocument: {doc_name}\n\nSection summaries:\n{body}"},
+    ]
+    return (llm.chat(messages, temperature=0.1, route="summary") or "").strip()
+
+
+def _from_stored(document_id: int, doc_name: str, stored: dict, last_chunk: Optional[int]) -> Optional[DocSummary]:
+    """A complete DocSummary from stored rows, or None if they do not cover the document's chunks."""
+    doc_row = stored.get(("document", 0))
+    if doc_row is None or last_chunk is None or doc_row["chunk_end"] != last_chunk:
+        return None
+    section_rows = [stored[key] for key in sorted(key for key in stored if key[0] == "section")]
+    if not section_rows or [r["section_index"] for r in section_rows] != list(range(len(section_rows))):
+        return None
+    if section_rows[-1]["chunk_end"] != last_chunk:
+        return None
+    return DocSummary(
+        document_id=document_id,
+        doc_name=doc_name,
+        source_hash=doc_row["source_hash"],
+        content=doc_row["content"],
+        sections=[
+            SectionSummary(
+                section_index=r["section_index"],
+                chunk_start=r["chunk_start"],
+                chunk_end=r["chunk_end"],
+                source_hash=r["source_hash"],
+                content=r["content"],
+            )
+            for r in section_rows
+        ],
+    )
+
+
+def ensure_summaries(
+    llm,
+    document_id: int,
+    doc_name: str,
+    chunks: Optional[List[dict]] = None,
+    max_workers: int = 1,
+) -> Optional[DocSummary]:
+    """
+    Return the summary tree for a document, building what is missing.
+
+    Sections are groups of SUMMARY_SECTION_CHUNKS consecutive chunks. Stored
+    summaries are reused when the hash of their chunks is unchanged, so only
+    changed sections (and then the document summary) call the LLM.
+    Pass `chunks` at ingest time to (re)build from them directly. Without
+    them, the in-process cache is used first, then stored summaries that
+    reach the document's last chunk; chunk text is only fetched when
+    something has to be summarized. max_workers bounds concurrent summary
+    calls; callers with their own LLM concurrency cap (the batch CLI)
+    should leave it at 1.
+    """
+    document_id = int(document_id)
+    stored = None
+    if chunks is None:
+        with _lock:
+            cached = _cache.get(document_id)
+        if cached is not None:
+            return cached
+
+        stored = {(r["level"], r["section_index"]): r for r in fetch_summaries([document_id])}
+        summary = _from_stored(document_id, doc_name, stored, fetch_last_chunk_index(document_id))
+        if summary is not None:
+            with _lock:
+                _cache[document_id] = summary
+            return summary
+        chunks = fetch_chunks(document_id)
+    chunks = sorted((c for c in chunks if c.get("content")), key=lambda c: c["chunk_index"])
+    if not chunks:
+        return None
+
+    size = _section_chunks()
+    groups = [chunks[i : i + size] for i in range(0, len(chunks), size)]
+    hashes = [content_hash(*(c["content"] for c in g)) for g in groups]
+    doc_hash = content_hash(*hashes)
+
+    with _lock:
+        cached = _cache.get(document_id)
+        if cached is not None and cached.source_hash == doc_hash:
+            return cached
+
+    if stored is None:
+        stored = {(r["level"], r["section_index"]): r for r in fetch_summaries([document_id])}
+
+    todo = [
+        idx for idx, h in enumerate(hashes)
+        if stored.get(("section", idx), {}).get("source_hash") != h
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        fresh = dict(zip(todo, pool.map(lambda idx: _summarize_section(llm, doc_name, groups[idx]), todo)))
+
+    sections = [
+        SectionSummary(
+            section_index=idx,
+            chunk_start=g[0]["chunk_index"],
+            chunk_end=g[-1]["chunk_index"],
+            source_hash=hashes[idx],
+            content=fresh[idx] if idx in fresh else stored[("section", idx)]["content"],
+        )
+        for idx, g in enumerate(groups)
+    ]
+
+    doc_row = stored.get(("document", 0))
+    if doc_row and doc_row.get("source_hash") == doc_hash:
+        doc_text = doc_row["content"]
+    else:
+        doc_text = _summarize_document(llm, doc_name, sections)
+
+    rows = [
+        {
+            "document_id": document_id,
+            "level": "section",
+            "section_index": s.section_index,
+            "chunk_start": s.chunk_start,
+            "chunk_end": s.chunk_end,
+            "source_hash": s.source_hash,
+            "content": s.content,
+        }
+        for s in sections if s.section_index in fresh
+    ]
+    if not doc_row or doc_row.get("source_hash") != doc_hash:
+        rows.append({
+            "document_id": document_id,
+            "level": "document",
+            "section_index": 0,
+            "chunk_start": chunks[0]["chunk_index"],
+            "chunk_end": chunks[-1]["chunk_index"],
+            "source_hash": doc_hash,
+            "content": doc_text,
+        })
+    upsert_summaries(rows)
+
+    summary = DocSummary(
+        document_id=document_id,
+        doc_name=doc_name,
+        source_hash=doc_hash,
+        content=doc_text,
+        sections=sections,
+    )
+    with _lock:
+        _cache[document_id] = summary
+    return summary
+
+
+def build_overview_context(
+    llm,
+    doc_ids=None,
+    max_docs: Optional[int] = None,
+    limit_chars: int = 24000,
+    max_workers: int = 1,
+) -> Tuple[str, List[dict]]:
+    """
+    Compact context for overview questions and handbook outlines: each
+    document's summary, then section summaries while they fit in limit_chars.
+    Returns ("", []) when the scope is empty or larger than max_docs, or when
+    summaries cannot be loaded or built, so the caller can fall back to chunk
+    retrieval.
+    """
+    if max_docs is None:
+        max_docs = int(os.getenv("SUMMARY_MAX_DOCS", "6"))
+
+    try:
+        names = doc_names(doc_ids) if doc_ids is not None else get_documents()
+        if not names or len(names) > max_docs:
+            return "", []
+
+        summaries = [
+            ensure_summaries(llm, doc_id, name, max_workers=max_workers)
+            for doc_id, name in sorted(names.items())
+        ]
+    except Exception:
+        # e.g. doc_summaries table not migrated, REST or LLM failure
+        return "", []
+    summaries = [s for s in summaries if s]
+
+    blocks: List[str] = []
+    rows: List[dict] = []
+    total = 0
+
+    def add(s: DocSummary, chunk_start: int, chunk_end: int, content: str) -> bool:
+        nonlocal total
+        block = f"[Doc: {s.doc_name}, Chunk: {chunk_start}-{chunk_end}]\n{content}\n"
+        if total + len(block) > limit_chars:
+            return False
+        blocks.append(block)
+        rows.append({
+            "document_id": s.document_id,
+            "doc_name": s.doc_name,
+            "chunk_index": f"{chunk_start}-{chunk_end}",
+            "content": content,
+            "similarity": "summary",
+        })
+        total += len(block)
+        return True
+
+    for s in summaries:
+        first, last = s.sections[0].chunk_start, s.sections[-1].chunk_end
+        add(s, first, last, s.content)
+
+    for s in summaries:
+        for sec in s.sections:
+            if not add(s, sec.chunk_start, sec.chunk_end, sec.content):
+                break
+
+    return "\n---\n".join(blocks), rows
@@ -1,6 +1,8 @@
 import os
 import requests
 
+from . import doc_catalog
+
 def _headers():
     key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
     return {
@@ -14,15 +16,88 @@ def insert_document(doc_name: str) -> int:
     url = os.getenv("SUPABASE_URL").rstrip("/") + "/rest/v1/documents"
     r = requests.post(url, headers=_headers(), json={"doc_name": doc_name}, timeout=60)
     r.raise_for_status()
-    return r.json()[0]["id"]
+    doc_id = r.json()[0]["id"]
+    doc_catalog.add_document(doc_id, doc_name)
+    return doc_id
+
+def fetch_documents(etag=None):
+    """
+    Returns (rows, etag). rows is None when the server answered 304 Not Modified
+    for the given etag.
+    """
+    url = os.getenv("SUPABASE_URL").rstrip("/") + "/rest/v1/documents?select=id,doc_name&order=id"
+    headers = _headers()
+    if etag:
+        headers["If-None-Match"] = etag
+
+    r = requests.get(url, headers=headers, timeout=60)
+    if r.status_code == 304:
+        return None, etag
+    r.raise_for_status()
+    return r.json(), r.headers.get("ETag")
 
 def insert_chunks(rows: list[dict]) -> None:
     url = os.getenv("SUPABASE_URL").rstrip("/") + "/rest/v1/chunks"
     r = requests.post(url, headers=_headers(), json=rows, timeout=120)
     r.raise_for_status()
 
-def match_chunks(query_embedding: list[float], match_count: int = 8, filter_document_ids=None) -> list[dict]:
-    url = os.getenv("SUPABASE_URL").rstrip("/") + "/rest/v1/rpc/match_chunks"
+def fetch_chunks(document_id: int, page_size: int = 1000) -> list[dict]:
+    base = os.getenv("SUPABASE_URL").rstrip("/") + "/rest/v1/chunks"
+    out = []
+    offset = 0
+    while True:
+        params = {
+            "select": "chunk_index,content",
+            "document_id": f"eq.{int(document_id)}",
+            "order": "chunk_index",
+            "limit": page_size,
+            "offset": offset,
+        }
+        r = requests.get(base, headers=_headers(), params=params, timeout=120)
+        r.raise_for_status()
+        page = r.json()
+        out.extend(page)
+        if len(page) < page_size:
+            return out
+        offset += page_size
+
+def fetch_last_chunk_index(document_id: int):
+    """Highest chunk_index with content for a document, or None; a cheap completeness check."""
+    url = os.getenv("SUPABASE_URL").rstrip("/") + "/rest/v1/chunks"
+    params = {
+        "select": "chunk_index",
+        "document_id": f"eq.{int(document_id)}",
+        "content": "neq.",
+        "order": "chunk_index.desc",
+        "limit": 1,
+    }
+    r = requests.get(url, headers=_headers(), params=params, timeout=60)
+    r.raise_for_status()
+    rows = r.json()
+    return int(rows[0]["chunk_index"]) if rows else None
+
+def fetch_summaries(document_ids: list[int]) -> list[dict]:
+    if not document_ids:
+        return []
+    url = os.getenv("SUPABASE_URL").rstrip("/") + "/rest/v1/doc_summaries"
+    ids = ",".join(str(int(i)) for i in document_ids)
+    params = {"select": "*", "document_id": f"in.({ids})", "order": "document_id,section_index"}
+    r = requests.get(url, headers=_headers(), params=params, timeout=60)
+    r.raise_for_status()
+    return r.json()
+
+def upsert_summaries(rows: list[dict]) -> None:
+    if not rows:
+        return
+    url = os.getenv("SUPABASE_URL").rstrip("/") + "/rest/v1/doc_summaries?on_conflict=document_id,level,section_index"
+    headers = _headers()
+    headers["Prefer"] = "resolution=merge-duplicates,return=minimal"
+    r = requests.post(url, headers=headers, json=rows, timeout=120)
+    r.raise_for_status()
+
+def match_chunks(query_embedding: list[float], match_count: int = 8, filter_document_ids=None, two_stage=None) -> list[dict]:
+    if two_stage is None:
+        two_stage = os.getenv("RETRIEVAL_TWO_STAGE", "0") == "1"
 
     # filter_document_ids should be either None or a list of ints
     payload = {
@@ -31,7 +106,25 @@ def match_chunks(query_embedding: list[float], match_count: int = 8, filter_docu
         "filter_document_ids": filter_document_ids,  # <-- list or None
     }
 
+    if two_stage:
+        # Coarse scan over binary-quantized Matryoshka prefixes, exact rerank of candidates
+        url = os.getenv("SUPABASE_URL").rstrip("/") + "/rest/v1/rpc/match_chunks_two_stage"
+        # Binary-256 codes need a wide candidate pool for good recall (see bench_quantized.py);
+        # hnsw.ef_search tops out at 1000, so more candidates could never be returned
+        payload["candidate_count"] = min(1000, match_count * int(os.getenv("RETRIEVAL_CANDIDATE_FACTOR", "32")))
+    else:
+        url = os.getenv("SUPABASE_URL").rstrip("/") + "/rest/v1/rpc/match_chunks"
+
     r = requests.post(url, headers=_headers(), json=payload, timeout=60)
     r.raise_for_status()
-    return r.json()
-    
\ No newline at end of file
+    rows = r.json()
+
+    # Newer match_chunks joins documents and returns doc_name; otherwise fill it
+    # from the catalog in one pass so callers never look names up per row.
+    missing = {row["document_id"] for row in rows if not row.get("doc_name")}
+    if missing:
+        names = doc_catalog.doc_names(missing)
+        for row in rows:
+            if not row.get("doc_name"):
+                row["doc_name"] = names[int(row["document_id"])]
+    return rows
@@ -0,0 +1,81 @@
+"""
+Benchmark two-stage (Matryoshka + quantized) search against exact search.
+
+    python bench_quantized.py                      # synthetic Matryoshka-like vectors
+    python bench_quantized.py --embeddings X.npy   # real chunk embeddings (N x 768)
+
+Queries are held out: they are never added to the index, so recall@k
+measures how often the two-stage top k matches the exact top k for unseen
+vectors. Reports memory per chunk, mean query latency and recall@k.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.rag.quantized import QuantizedIndex, normalize
+
+
+def synthetic(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    # Overlapping clusters whose variance decays along the dimensions, so
+    # leading components carry more of the signal (as in Matryoshka
+    # embeddings) but the tail still matters for ranking near neighbours.
+    rng = np.random.default_rng(seed)
+    decay = np.exp(-np.arange(dim) / (dim / 2))
+    centers = rng.normal(size=(max(1, n // 200), dim)) * decay
+    labels = rng.integers(0, len(centers), size=n)
+    return normalize(centers[labels] + 1.5 * rng.normal(size=(n, dim)) * decay)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embeddings", help=".npy file of chunk embeddings")
+    parser.add_argument("--n", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--coarse-dims", default="128,256")
+    parser.add_argument("--candidate-factor", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.embeddings:
+        vectors = normalize(np.load(args.embeddings))
+    else:
+        vectors = synthetic(args.n + args.queries, args.dim)
+
+    # Hold out queries so none of them is (a noisy copy of) an indexed vector
+    rng = np.random.default_rng(1)
+    order = rng.permutation(len(vectors))
+    queries = vectors[order[: args.queries]]
+    data = vectors[order[args.queries :]]
+    keys = list(range(len(data)))
+
+    configs = [("exact", data.shape[1])]
+    for d in (int(x) for x in args.coarse_dims.split(",")):
+        configs += [("int8", d), ("binary", d)]
+
+    truth = None
+    print(f"{len(data):,} chunks x {data.shape[1]} dims, {args.queries} queries, k={args.k}\n")
+    print(
+        f"{'mode':<8}{'dim':>6}{'coarse B/chunk':>16}{'full B/chunk':>14}{'ms/query':>10}{'recall@k':>10}"
+    )
+
+    for mode, dim in configs:
+        index = QuantizedIndex(coarse_dim=dim, mode=mode, candidate_factor=args.candidate_factor)
+        index.add(keys, data)
+
+        t0 = time.perf_counter()
+        found = [[key for key, _ in index.search(q, k=args.k)] for q in queries]
+        ms = (time.perf_counter() - t0) * 1000 / len(queries)
+
+        if truth is None:
+            truth = found
+        recall = np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+        mem = index.memory_per_chunk()
+        print(
+            f"{mode:<8}{dim:>6}{mem['coarse_bytes']:>16}{mem['full_bytes']:>14}{ms:>10.2f}{recall:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+# Shared fakes for the offline tests; the google-genai client is replaced by
+# FakeClient, which records every generate_content call.
+
+DEFAULT_OUTLINE = "1. Introduction\n2. Deployment"
+
+
+class QuotaError(Exception):
+    code = 429
+
+
+class FakeModels:
+    def __init__(self, fail_models=(), error=QuotaError, outline=DEFAULT_OUTLINE):
+        self.calls = []
+        self.fail_models = set(fail_models)
+        self.error = error
+        self.outline = outline
+
+    def generate_content(self, model, contents, config):
+        self.calls.append({"model": model, "max_tokens": config["max_output_tokens"], "prompt": contents})
+        if model in self.fail_models:
+            raise self.error("RESOURCE_EXHAUSTED")
+        text = self.outline if "Output Markdown" in contents else "word " * 300
+        return type("Resp", (), {"text": text})()
+
+
+class FakeClient:
+    def __init__(self, **kw):
+        self.models = FakeModels(**kw)
@@ -0,0 +1,72 @@
+import numpy as np
+
+from app.rag.answer_cache import SemanticAnswerCache, is_refusal
+
+
+def vec(*components):
+    v = np.zeros(8, dtype=np.float32)
+    v[: len(components)] = components
+    return v
+
+
+def test_hit_above_threshold_miss_below():
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.9)
+    cache.store(vec(1, 0), "What is RRF?", "Rank fusion.", [1], "sig")
+
+    hit = cache.lookup(vec(1, 0.1), [1], "sig")
+    assert hit["answer"] == "Rank fusion." and hit["similarity"] > 0.99
+    assert cache.lookup(vec(1, 1), [1], "sig") is None  # cosine ~0.71
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_scopes_are_isolated():
+    cache = SemanticAnswerCache(max_entries=4)
+    cache.store(vec(1), "q", "about doc 1", [1], "sig")
+
+    assert cache.lookup(vec(1), [2], "sig") is None
+    assert cache.lookup(vec(1), None, "sig") is None
+    assert cache.lookup(vec(1), [1], "sig")["answer"] == "about doc 1"
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.store(vec(1, 0, 0), "a", "A", None, "sig")
+    cache.store(vec(0, 1, 0), "b", "B", None, "sig")
+    cache.lookup(vec(1, 0, 0), None, "sig")  # "a" is now most recent
+    cache.store(vec(0, 0, 1), "c", "C", None, "sig")
+
+    assert len(cache) == 2
+    assert cache.lookup(vec(0, 1, 0), None, "sig") is None
+    assert cache.lookup(vec(1, 0, 0), None, "sig")["answer"] == "A"
+    assert cache.lookup(vec(0, 0, 1), None, "sig")["answer"] == "C"
+
+
+def test_changed_documents_invalidate_entries():
+    cache = SemanticAnswerCache(max_entries=4)
+    cache.store(vec(1), "q", "old", [1], "sig-v1")
+
+    assert cache.lookup(vec(1), [1], "sig-v2") is None
+    assert len(cache) == 0
+
+
+def test_stale_best_match_does_not_hide_current_entry():
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.9)
+    cache.store(vec(1, 0), "q", "stale", [1], "sig-v1")
+    cache.store(vec(1, 0.2), "q again", "current", [1], "sig-v2")
+
+    hit = cache.lookup(vec(1, 0), [1], "sig-v2")
+
+    assert hit["answer"] == "current"
+    assert len(cache) == 1
+
+
+def test_refusals_are_not_cached():
+    cache = SemanticAnswerCache(max_entries=4)
+    refusal = "I couldn't find that in the indexed PDFs. Could you name the document?"
+    assert is_refusal(refusal)
+
+    cache.store(vec(1), "q", refusal, None, "sig")
+    cache.store(vec(1), "q", "", None, "sig")
+
+    assert len(cache) == 0
+    assert cache.lookup(vec(1), None, "sig") is None
@@ -0,0 +1,127 @@
+import json
+
+import pytest
+
+from app import batch
+from app.llm.longwriter import HandbookManifest, SectionRecord
+
+
+def write_jobs(tmp_path, *specs):
+    path = tmp_path / "jobs.jsonl"
+    path.write_text("\n".join(json.dumps(s) for s in specs) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_load_jobs_parses_fields_and_derives_ids(tmp_path):
+    path = write_jobs(
+        tmp_path,
+        {"id": "rag basics", "topic": "RAG", "doc_ids": ["3", 7], "target_words": 500, "k": 5},
+        {"topic": "Vector Search"},
+    )
+
+    first, second = batch.load_jobs(path)
+
+    assert first == batch.Job(job_id="rag_basics", topic="RAG", doc_ids=[3, 7], target_words=500, k=5)
+    assert second.doc_ids is None
+    assert second.job_id.startswith("vector_search_")
+    assert batch.load_jobs(path)[1].job_id == second.job_id  # stable across runs
+
+
+def test_load_jobs_rejects_duplicate_ids(tmp_path):
+    path = write_jobs(tmp_path, {"id": "a", "topic": "RAG"}, {"id": "a", "topic": "Other"})
+    with pytest.raises(ValueError, match="duplicate job id 'a'"):
+        batch.load_jobs(path)
+
+
+@pytest.mark.parametrize("field", ["doc_ids", "doc_names"])
+def test_load_jobs_rejects_empty_scope(tmp_path, field):
+    path = write_jobs(tmp_path, {"topic": "RAG", field: []})
+    with pytest.raises(ValueError, match=f"'{field}' is empty"):
+        batch.load_jobs(path)
+
+
+def test_load_jobs_requires_topic(tmp_path):
+    with pytest.raises(ValueError, match="missing 'topic'"):
+        batch.load_jobs(write_jobs(tmp_path, {"id": "x"}))
+
+
+class FakeWriter:
+    llm = None
+
+    def __init__(self):
+        self.calls = []
+
+    def generate_handbook_with_manifest(self, topic, initial_sources_text, retrieve_sources_for_section, previous=None, **kw):
+        self.calls.append({"topic": topic, "previous": previous})
+        text, _ = retrieve_sources_for_section("Intro", 3)
+        section = SectionRecord("Intro", "hash", ["1:0"], text)
+        return f"# Handbook: {topic}\n\n## Intro\n\n{text}\n", HandbookManifest(topic, "1. Intro", [section])
+
+
+@pytest.fixture
+def fake_retrieval(monkeypatch):
+    monkeypatch.setattr(batch, "build_overview_context", lambda llm, doc_ids, max_workers=1: ("", []))
+    monkeypatch.setattr(
+        batch, "build_context",
+        lambda query, k, filter_doc_ids: (f"sources for {query}", [{"document_id": 1, "chunk_index": 0}]),
+    )
+
+
+def test_run_job_writes_outputs_and_is_done(tmp_path, fake_retrieval):
+    job = batch.Job(job_id="rag", topic="RAG")
+    out = str(tmp_path)
+    assert not batch.is_done(job, out)
+
+    meta = batch.run_job(job, FakeWriter(), batch.RetrievalCache(), out)
+
+    assert meta["status"] == "ok"
+    assert meta["sections"] == 1
+    assert (tmp_path / "rag.md").read_text(encoding="utf-8").startswith("# Handbook: RAG")
+    assert json.loads((tmp_path / "rag.json").read_text(encoding="utf-8"))["status"] == "ok"
+    manifest = json.loads((tmp_path / "rag.manifest.json").read_text(encoding="utf-8"))
+    assert manifest["sections"][0]["chunk_ids"] == ["1:0"]
+    assert batch.is_done(job, out)
+
+
+def test_run_job_regenerate_passes_previous_manifest(tmp_path, fake_retrieval):
+    job = batch.Job(job_id="rag", topic="RAG")
+    writer = FakeWriter()
+    batch.run_job(job, writer, batch.RetrievalCache(), str(tmp_path))
+    batch.run_job(job, writer, batch.RetrievalCache(), str(tmp_path), regenerate=True)
+
+    assert writer.calls[0]["previous"] is None
+    assert writer.calls[1]["previous"].sections[0].title == "Intro"
+
+
+def test_failed_job_is_not_done(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "build_overview_context", lambda llm, doc_ids, max_workers=1: ("", []))
+    monkeypatch.setattr(batch, "build_context", lambda query, k, filter_doc_ids: ("", []))
+    job = batch.Job(job_id="empty", topic="RAG")
+
+    meta = batch.run_job(job, FakeWriter(), batch.RetrievalCache(), str(tmp_path))
+
+    assert meta["status"] == "error"
+    assert "No context" in meta["error"]
+    assert not batch.is_done(job, str(tmp_path))
+
+
+def test_run_batch_skips_completed_jobs(tmp_path, fake_retrieval, monkeypatch, capsys):
+    writers = []
+
+    class BatchWriter(FakeWriter):
+        llm = type("LLM", (), {"route_stats": staticmethod(lambda: {})})()
+
+        def __init__(self):
+            super().__init__()
+            writers.append(self)
+
+    monkeypatch.setattr(batch, "LongWriter", BatchWriter)
+    jobs = [batch.Job(job_id="a", topic="A"), batch.Job(job_id="b", topic="B")]
+    batch.run_batch(jobs[:1], str(tmp_path), concurrency=1)
+
+    report = batch.run_batch(jobs, str(tmp_path), concurrency=1)
+
+    assert report["skipped"] == ["a"]
+    assert report["completed"] == ["b"]
+    assert [c["topic"] for c in writers[-1].calls] == ["B"]
+    assert "[skip] a already completed" in capsys.readouterr().out
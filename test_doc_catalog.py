@@ -0,0 +1,31 @@
+import pytest
+
+from app.rag import doc_catalog, supabase_rest
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    calls = []
+
+    def fetch_documents(etag=None):
+        calls.append(etag)
+        return [{"id": 1, "doc_name": "guide.pdf"}], None
+
+    monkeypatch.setattr(supabase_rest, "fetch_documents", fetch_documents)
+    doc_catalog.invalidate()
+    yield calls
+    doc_catalog.invalidate()
+
+
+def test_unknown_ids_are_not_refetched_within_ttl(fetches):
+    for _ in range(5):
+        assert doc_catalog.doc_names([1, 99]) == {1: "guide.pdf", 99: "doc_99"}
+    assert len(fetches) == 2  # initial load + one forced refresh for id 99
+
+
+def test_catalog_failure_falls_back_to_placeholder_names(monkeypatch, fetches):
+    def fail(etag=None):
+        raise ConnectionError("supabase unreachable")
+
+    monkeypatch.setattr(supabase_rest, "fetch_documents", fail)
+    assert doc_catalog.doc_names([3]) == {3: "doc_3"}
@@ -0,0 +1,82 @@
+from app.rag import lexical
+from app.rag.lexical import LexicalIndex, exact_terms
+
+
+def make_index():
+    index = LexicalIndex()
+    index.add_document(1, "guide.pdf", [
+        {"chunk_index": 0, "content": "Section 3.2.1 configures HNSW ef_search for pgvector."},
+        {"chunk_index": 1, "content": "Dropout randomly zeroes activations during training."},
+        {"chunk_index": 2, "content": "Dropout is a regularization technique; dropout reduces overfitting."},
+        {"chunk_index": 3, "content": "The transformer uses attention. Each transformer block has attention."},
+        {"chunk_index": 4, "content": "Error 429 means the quota is exhausted."},
+        {"chunk_index": 5, "content": "HNSW index builds are slow on large tables."},
+        {"chunk_index": 6, "content": "The default ef_search is 40."},
+        {"chunk_index": 7, "content": "Every error is logged before a retry."},
+        {"chunk_index": 8, "content": "FAISS is an alternative vector library."},
+        {"chunk_index": 9, "content": "Section 2 covers ingestion; section 4 covers deployment."},
+        {"chunk_index": 10, "content": "The last section lists open questions."},
+        {"chunk_index": 11, "content": "An error in the outline step falls back to retrieval."},
+    ] + [
+        {"chunk_index": i, "content": f"Filler paragraph {i} about training and evaluation."}
+        for i in range(12, 40)
+    ])
+    return index
+
+
+def test_exact_terms_shapes():
+    assert exact_terms("What does section 3.2.1 say?") == ["3.2.1"]
+    assert exact_terms("How is HNSW tuned?") == ["hnsw"]
+    assert exact_terms('Where is "ef_search" set?') == ["ef_search"]
+    assert exact_terms("What is dropout?") == []
+    assert exact_terms("HNSW") == ["hnsw"]
+    assert exact_terms("RRF?") == ["rrf"]
+    assert exact_terms("EXPLAIN TRANSFORMER") == []
+    assert exact_terms("What's the point of dropout?") == []
+
+
+def test_conceptual_questions_are_not_confident():
+    index = make_index()
+    for query in ("What is dropout?", "Explain transformer"):
+        rows = index.search(query)
+        assert rows
+        assert not index.is_confident(query, rows)
+
+
+def test_exact_lookup_is_confident():
+    index = make_index()
+    for query in ("section 3.2.1", "HNSW ef_search", "error 429"):
+        rows = index.search(query)
+        assert index.is_confident(query, rows), query
+
+
+def test_single_matching_row_is_confident():
+    index = make_index()
+    for query in ("FAISS", "FAISS?", "FAISS library"):
+        rows = index.search(query)
+        assert len(rows) == 1
+        assert index.is_confident(query, rows), query
+
+
+def test_document_seen_before_its_chunks_is_indexed_later(tmp_path, monkeypatch):
+    monkeypatch.setenv("LEXICAL_INDEX_PATH", str(tmp_path / "lexical.json.gz"))
+    monkeypatch.setattr(lexical, "_index", None)
+    chunks = {7: []}  # catalog row exists, insert_chunks has not finished
+    monkeypatch.setattr(lexical, "fetch_chunks", lambda doc_id: chunks[doc_id])
+
+    lexical.ensure_documents({7: "new.pdf"})
+    assert not lexical.get_index().has_document(7)
+
+    chunks[7] = [{"chunk_index": 0, "content": "HNSW graphs trade memory for recall."}]
+    lexical.index_document(7, "new.pdf", chunks[7])
+    assert lexical.search("HNSW")[0][0]["document_id"] == 7
+
+
+def test_index_document_replaces_existing_entry():
+    index = make_index()
+    index.add_document(2, "other.pdf", [{"chunk_index": 0, "content": "draft text"}])
+    index.add_document(2, "other.pdf", [{"chunk_index": 0, "content": "FAISS final text"}], replace=True)
+
+    assert [r["content"] for r in index.search("draft")] == []
+    assert len(index.search("FAISS")) == 2
+    assert index.search("Dropout")  # other documents survive the rebuild
@@ -0,0 +1,108 @@
+from conftest import FakeClient
+
+from app.llm.gemini_client import GeminiClient
+from app.llm.longwriter import LongWriter
+from app.llm.routing import ModelRouter, Route
+
+OUTLINE = "1. Introduction\n2. Retrieval\n3. Deployment"
+
+
+def make_writer():
+    route = Route("pro", 1000, 30, fallback_model="flash")
+    fake = FakeClient(outline=OUTLINE)
+    router = ModelRouter(routes={name: route for name in ("default", "outline", "section", "repair", "appendix")})
+    return LongWriter(llm=GeminiClient(client=fake, router=router)), fake.models
+
+
+def make_retriever(sources):
+    """sources: title -> list of chunk indexes; the text lists them in the given order."""
+    def retrieve(title, k):
+        rows = [{"document_id": 1, "chunk_index": i} for i in sources[title]]
+        return " ".join(f"[Chunk {r['chunk_index']}]" for r in rows), rows
+    return retrieve
+
+
+def generate(writer, sources, previous=None, topic="RAG"):
+    return writer.generate_handbook_with_manifest(
+        topic=topic,
+        initial_sources_text="sources",
+        retrieve_sources_for_section=make_retriever(sources),
+        target_words=900,
+        previous=previous,
+    )
+
+
+def test_regeneration_rewrites_only_changed_section():
+    writer, models = make_writer()
+    sources = {"Introduction": [0, 1], "Retrieval": [2, 3], "Deployment": [4, 5]}
+    _, first = generate(writer, sources)
+    assert len(models.calls) == 4  # outline + 3 sections
+
+    models.calls.clear()
+    sources["Retrieval"] = [2, 6]
+    handbook_md, second = generate(writer, sources, previous=first)
+
+    assert len(models.calls) == 1
+    assert "Current section to write: Retrieval" in models.calls[0]["prompt"]
+    assert [s.reused for s in second.sections] == [True, False, True]
+    assert second.outline == first.outline
+    assert handbook_md.count("## ") == 4  # plan + 3 sections
+
+
+def test_unchanged_sources_make_no_llm_calls():
+    writer, models = make_writer()
+    sources = {"Introduction": [0, 1], "Retrieval": [2, 3], "Deployment": [4, 5]}
+    _, first = generate(writer, sources)
+
+    models.calls.clear()
+    _, second = generate(writer, sources, previous=first)
+
+    assert models.calls == []
+    assert all(s.reused for s in second.sections)
+
+
+def test_reordered_sources_are_reused():
+    writer, models = make_writer()
+    sources = {"Introduction": [0, 1], "Retrieval": [2, 3], "Deployment": [4, 5]}
+    _, first = generate(writer, sources)
+
+    models.calls.clear()
+    sources["Retrieval"] = [3, 2]  # same chunks, new fused ranking
+    _, second = generate(writer, sources, previous=first)
+
+    assert models.calls == []
+    assert all(s.reused for s in second.sections)
+
+
+def test_text_only_retriever_falls_back_to_text_hash():
+    writer, models = make_writer()
+    texts = {"Introduction": "a", "Retrieval": "b", "Deployment": "c"}
+
+    def run(previous=None):
+        return writer.generate_handbook_with_manifest(
+            topic="RAG",
+            initial_sources_text="sources",
+            retrieve_sources_for_section=lambda title, k: texts[title],
+            target_words=900,
+            previous=previous,
+        )
+
+    _, first = run()
+    models.calls.clear()
+    texts["Deployment"] = "c2"
+    _, second = run(previous=first)
+
+    assert len(models.calls) == 1
+    assert [s.reused for s in second.sections] == [True, True, False]
+
+
+def test_topic_case_does_not_force_a_replan():
+    writer, models = make_writer()
+    sources = {"Introduction": [0, 1], "Retrieval": [2, 3], "Deployment": [4, 5]}
+    _, first = generate(writer, sources, topic="RAG")
+
+    models.calls.clear()
+    _, second = generate(writer, sources, previous=first, topic="  rag ")
+
+    assert models.calls == []
+    assert all(s.reused for s in second.sections)
@@ -0,0 +1,36 @@
+import numpy as np
+
+from app.rag.quantized import QuantizedIndex, hamming, int8_dot, normalize, quantize_binary, quantize_int8
+
+
+def reference_hamming(codes, query_bits):
+    return np.unpackbits(np.bitwise_xor(codes, query_bits), axis=-1).sum(axis=-1)
+
+
+def test_hamming_matches_bit_count_for_any_width():
+    rng = np.random.default_rng(0)
+    for dim in (256, 24):  # 32 bytes (uint64 words) and 3 bytes (byte fallback)
+        codes = quantize_binary(rng.normal(size=(50, dim)))
+        query = quantize_binary(rng.normal(size=dim))
+        assert (hamming(codes, query) == reference_hamming(codes, query)).all()
+
+
+def test_int8_dot_approximates_float_dot():
+    rng = np.random.default_rng(1)
+    vecs = normalize(rng.normal(size=(3000, 128)))  # spans several scan blocks
+    query = normalize(rng.normal(size=128))
+    codes, scales = quantize_int8(vecs)
+
+    assert np.allclose(int8_dot(codes, scales, query), vecs @ query, atol=0.01)
+
+
+def test_two_stage_search_respects_filter_and_finds_self():
+    rng = np.random.default_rng(2)
+    vecs = rng.normal(size=(400, 768))
+    for mode in ("int8", "binary", "exact"):
+        index = QuantizedIndex(coarse_dim=256, mode=mode)
+        index.add(list(range(400)), vecs, document_ids=[i % 4 for i in range(400)])
+
+        hits = index.search(vecs[10], k=5, filter_document_ids=[2])
+        assert hits[0][0] == 10
+        assert all(key % 4 == 2 for key, _ in hits)
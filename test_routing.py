@@ -0,0 +1,103 @@
+import pytest
+
+from conftest import FakeClient
+
+from app.llm.gemini_client import GeminiClient
+from app.llm.longwriter import LongWriter
+from app.llm.routing import ModelRouter, Route, default_routes
+
+
+def make_router():
+    return ModelRouter(routes={
+        "default": Route("pro", 1000, 30, fallback_model="flash"),
+        "chat": Route("flash", 1500, 30, fallback_model="flash"),
+        "outline": Route("pro", 1800, 30, fallback_model="flash"),
+        "section": Route("pro", 3500, 30, fallback_model="flash"),
+        "repair": Route("flash", 3500, 30, fallback_model="flash"),
+        "appendix": Route("flash", 3500, 30, fallback_model="flash"),
+    })
+
+
+def test_route_selects_model_and_budget():
+    fake = FakeClient()
+    llm = GeminiClient(client=fake, router=make_router())
+
+    llm.chat([{"role": "user", "content": "hi"}], route="chat")
+    llm.chat([{"role": "user", "content": "hi"}], route="section", max_tokens=2000)
+    llm.chat([{"role": "user", "content": "hi"}], route="unknown")
+
+    assert [(c["model"], c["max_tokens"]) for c in fake.models.calls] == [
+        ("flash", 1500),
+        ("pro", 2000),
+        ("pro", 1000),
+    ]
+
+
+def test_falls_back_to_fast_model_on_quota_error():
+    fake = FakeClient(fail_models={"pro"})
+    llm = GeminiClient(client=fake, router=make_router())
+
+    out = llm.chat([{"role": "user", "content": "hi"}], route="outline")
+
+    assert out.startswith("word")
+    assert [c["model"] for c in fake.models.calls] == ["pro", "flash"]
+    stats = llm.route_stats()["outline"]
+    assert stats["pro"]["errors"] == 1
+    assert stats["flash"]["fallbacks"] == 1
+    assert "p95_s" in stats["flash"]
+
+
+def test_falls_back_on_timeout():
+    fake = FakeClient(fail_models={"pro"}, error=TimeoutError)
+    llm = GeminiClient(client=fake, router=make_router())
+
+    llm.chat([{"role": "user", "content": "hi"}], route="section")
+
+    assert [c["model"] for c in fake.models.calls] == ["pro", "flash"]
+
+
+def test_other_errors_do_not_fall_back():
+    fake = FakeClient(fail_models={"pro"}, error=lambda _: ValueError("INVALID_ARGUMENT"))
+    llm = GeminiClient(client=fake, router=make_router())
+
+    with pytest.raises(ValueError):
+        llm.chat([{"role": "user", "content": "hi"}], route="section")
+    assert [c["model"] for c in fake.models.calls] == ["pro"]
+
+
+def test_longwriter_tags_calls_with_routes():
+    router = make_router()
+    writer = LongWriter(llm=GeminiClient(client=FakeClient(), router=router))
+
+    writer.generate_handbook(
+        topic="RAG",
+        initial_sources_text="sources",
+        retrieve_sources_for_section=lambda title, k: "sources",
+        target_words=1200,
+    )
+
+    stats = router.stats()
+    assert stats["outline"]["pro"]["calls"] == 1
+    assert stats["section"]["pro"]["calls"] == 2
+    assert stats["appendix"]["flash"]["calls"] >= 1
+    assert "repair" not in stats
+
+
+def test_route_budgets_apply_to_longwriter_calls(monkeypatch):
+    monkeypatch.setenv("GEMINI_TOKENS_SECTION", "2222")
+    assert default_routes()["section"].max_tokens == 2222
+
+    fake = FakeClient()
+    routes = make_router().routes
+    routes["section"] = Route("pro", 2222, 30, fallback_model="flash")
+    writer = LongWriter(llm=GeminiClient(client=fake, router=ModelRouter(routes=routes)))
+
+    writer.generate_handbook(
+        topic="RAG",
+        initial_sources_text="sources",
+        retrieve_sources_for_section=lambda title, k: "sources",
+        target_words=500,
+    )
+
+    budgets = [c["max_tokens"] for c in fake.models.calls]
+    assert budgets == [1800, 2222, 2222]  # outline, then two sections
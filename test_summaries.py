@@ -0,0 +1,79 @@
+import pytest
+
+from app.rag import summaries
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, messages, temperature=0.2, max_tokens=None, route="default"):
+        self.calls += 1
+        return f"summary {self.calls}"
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """In-memory chunks and doc_summaries tables, counting REST calls."""
+    chunks = {
+        1: [{"chunk_index": i, "content": f"doc 1 chunk {i}"} for i in range(30)],
+        2: [{"chunk_index": i, "content": f"doc 2 chunk {i}"} for i in range(5)],
+    }
+    rows = {}
+    calls = {"fetch_chunks": 0, "fetch_summaries": 0}
+
+    def fetch_chunks(document_id):
+        calls["fetch_chunks"] += 1
+        return [dict(c) for c in chunks[document_id]]
+
+    def fetch_summaries(document_ids):
+        calls["fetch_summaries"] += 1
+        return [dict(r) for (doc_id, _, _), r in rows.items() if doc_id in document_ids]
+
+    def upsert_summaries(new_rows):
+        for r in new_rows:
+            rows[(r["document_id"], r["level"], r["section_index"])] = dict(r)
+
+    monkeypatch.setattr(summaries, "fetch_chunks", fetch_chunks)
+    monkeypatch.setattr(summaries, "fetch_last_chunk_index", lambda doc_id: chunks[doc_id][-1]["chunk_index"])
+    monkeypatch.setattr(summaries, "fetch_summaries", fetch_summaries)
+    monkeypatch.setattr(summaries, "upsert_summaries", upsert_summaries)
+    monkeypatch.setattr(summaries, "doc_names", lambda ids: {int(i): f"doc{i}.pdf" for i in ids})
+    monkeypatch.setattr(summaries, "_cache", {})
+    return calls
+
+
+def test_overview_builds_once_then_serves_from_cache(store):
+    llm = FakeLLM()
+
+    for _ in range(3):
+        context, rows = summaries.build_overview_context(llm, [1, 2])
+        assert "doc1.pdf" in context and "doc2.pdf" in context
+
+    assert store["fetch_chunks"] == 2  # one build per document
+    assert llm.calls == 4 + 2  # 3 + 1 section summaries, 2 document summaries
+
+
+def test_stored_summaries_are_reused_without_chunk_text(store, monkeypatch):
+    llm = FakeLLM()
+    summaries.build_overview_context(llm, [1, 2])
+    monkeypatch.setattr(summaries, "_cache", {})  # e.g. a new process
+
+    context, _ = summaries.build_overview_context(llm, [1, 2])
+
+    assert context
+    assert store["fetch_chunks"] == 2
+    assert llm.calls == 6
+
+
+def test_ingest_with_chunks_rebuilds_only_what_changed(store):
+    llm = FakeLLM()
+    summaries.ensure_summaries(llm, 1, "doc1.pdf")
+    chunks = [{"chunk_index": i, "content": f"doc 1 chunk {i}"} for i in range(30)]
+    chunks[0]["content"] = "edited"
+
+    summary = summaries.ensure_summaries(llm, 1, "doc1.pdf", chunks=chunks)
+
+    assert llm.calls == 4 + 2  # 3 sections + document, then the edited section + document
+    assert summary.sections[0].content == "summary 5"
+    assert summary.sections[1].content == "summary 2"
@@ -5,12 +5,18 @@ from dotenv import load_dotenv
 
 from app.rag.pdf_extract import extract_text_from_pdf
 from app.rag.chunking import chunk_text
-from app.rag.embeddings_gemini import embed_documents, embed_query
-from app.rag.supabase_rest import insert_document, insert_chunks, match_chunks
+from app.rag.embeddings_gemini import embed_documents
+from app.rag.supabase_rest import insert_document, insert_chunks
+from app.rag.context import build_context as _build_context, embed_query_cached, lexical_search
+from app.rag.answer_cache import get_cache, scope_signature
+from app.rag.summaries import ensure_summaries, build_overview_context
+from app.rag.lexical import index_document
+from app.rag.doc_catalog import get_documents
 
 from app.llm.gemini_client import GeminiClient
 from app.llm.prompts import SYSTEM_CHAT
-from app.llm.longwriter import LongWriter, SourceChunk, format_sources
+from app.llm.longwriter import LongWriter
+from app.artifacts import save_handbook, load_meta, read_section, artifact_path, load_manifest, latest_for_topic, exists
 
 load_dotenv()
 
@@ -52,18 +58,15 @@ st.markdown("""
 
 llm = GeminiClient()
 writer = LongWriter()
+answer_cache = get_cache()
 
 # ---------------------------
 # Session state init
 # ---------------------------
 if "messages" not in st.session_state:
     st.session_state.messages = []
-if "doc_map" not in st.session_state:
-    st.session_state.doc_map = {}  # document_id -> doc_name
 if "last_retrieval" not in st.session_state:
     st.session_state.last_retrieval = []
-if "indexed_docs" not in st.session_state:
-    st.session_state.indexed_docs = []  # list of {"id": doc_id, "name": filename}
 if "active_doc_id" not in st.session_state:
     st.session_state.active_doc_id = None
 
@@ -135,9 +138,7 @@ with st.sidebar:
                 embs = embed_documents(contents)
 
                 st.write("☁️ Uploading to database...")
-                doc_id = insert_document(f.name)
-                st.session_state.doc_map[doc_id] = f.name
-                st.session_state.indexed_docs.append({"id": doc_id, "name": f.name})
+                doc_id = insert_document(f.name)  # also registers the name in the document catalog
 
                 rows = [{
                     "document_id": doc_id,
@@ -148,6 +149,15 @@ with st.sidebar:
                 } for idx, c in enumerate(chunks)]
 
                 insert_chunks(rows)
+                index_document(doc_id, f.name, chunks)
+
+                st.write("📝 Summarizing sections...")
+                try:
+                    ensure_summaries(llm, doc_id, f.name, chunks=chunks, max_workers=4)
+                except Exception as e:
+                    # Summaries are rebuilt lazily on the first overview question
+                    st.write(f"⚠️ Summaries skipped: {e}")
+
                 status.update(label=f"Indexed {f.name} ({len(chunks)} chunks) ✅", state="complete", expanded=False)
 
     st.divider()
@@ -157,33 +167,44 @@ with st.sidebar:
     # ---------------------------
     st.header("🔍 Search Scope")
 
-    # doc_map is {doc_id: doc_name}
-    doc_options = [(doc_id, name) for doc_id, name in st.session_state.doc_map.items()]
-    doc_options.sort(key=lambda x: x[1].lower())
+    # Catalog is {doc_id: doc_name} for every stored document, cached per process
+    try:
+        doc_map = get_documents()
+    except Exception as e:
+        # Keep the UI usable when Supabase is unreachable or not configured
+        st.error(f"Could not load the document list: {e}")
+        doc_map = {}
+    doc_options = sorted(doc_map, key=lambda doc_id: (doc_map[doc_id].lower(), doc_id))
 
     scope_mode = st.radio("Scope", ["All documents", "Selected documents"], index=0, label_visibility="collapsed")
 
     selected_doc_ids = None
     if scope_mode == "Selected documents":
-        selected_names = st.multiselect(
+        # Options are ids so duplicate file names stay distinct
+        selected_doc_ids = st.multiselect(
             "Choose documents",
-            options=[name for _, name in doc_options],
-            default=[name for _, name in doc_options[:1]] if doc_options else [],
+            options=doc_options,
+            default=doc_options[:1],
+            format_func=lambda doc_id: doc_map.get(doc_id, f"doc_{doc_id}"),
         )
 
-        # map names back to ids
-        name_to_id = {name: doc_id for doc_id, name in doc_options}
-        selected_doc_ids = [name_to_id[n] for n in selected_names if n in name_to_id]
-
         if not selected_doc_ids:
             st.warning("Select at least one document, or switch back to All documents.")
             
     # Link the selected scoping to the session state for filtering
-    # Now storing either None (All docs) or a List[str] of doc_ids
+    # Now storing either None (All docs) or a List[int] of doc_ids
     st.session_state.active_doc_id = selected_doc_ids
     
     st.divider()
     
+    # Per-route model latency, shared by chat and handbook calls in this process
+    with st.expander("⏱️ Model Routes (Latency)"):
+        route_stats = llm.route_stats()
+        if not route_stats:
+            st.caption("No model calls yet.")
+        else:
+            st.json(route_stats, expanded=False)
+
     # UX: Move debug info to sidebar expander to keep main chat area clean
     with st.expander("🛠️ Retrieved Context (Debug)"):
         rows = st.session_state.get("last_retrieval", [])
@@ -191,9 +212,8 @@ with st.sidebar:
             st.caption("No context retrieved yet.")
         else:
             for r in rows[:6]:
-                doc_name = st.session_state.doc_map.get(r["document_id"], f"doc_{r['document_id']}")
-                st.markdown(f"**{doc_name}** (Chunk {r['chunk_index']})")
-                st.caption(f"Similarity: {r.get('similarity', 'n/a')}")
+                st.markdown(f"**{r['doc_name']}** (Chunk {r['chunk_index']})")
+                st.caption(f"Similarity: {r.get('similarity', r.get('bm25', 'n/a'))}")
                 st.text((r["content"] or "")[:300] + "...")
                 st.divider()
 
@@ -204,7 +224,7 @@ st.title("📚 AI Handbook Generator")
 st.caption("Upload PDFs → Ask Questions → Generate a 20k-word Markdown Handbook")
 
 # UX: Empty State Onboarding
-if not st.session_state.messages and not st.session_state.indexed_docs:
+if not st.session_state.messages and not doc_map:
     st.info("👋 **Welcome!** Please upload a PDF in the sidebar to get started.")
 elif not st.session_state.messages:
     st.success("✅ **Documents ready!** Ask a question below, or type `Generate a handbook on [topic]`.")
@@ -212,61 +232,72 @@ elif not st.session_state.messages:
 # ---------------------------
 # Context builder (RAG)
 # ---------------------------
-def build_context(query: str, k: int = 16, filter_doc_id=None):
-    q_emb = embed_query(query)
-
+def build_context(query: str, k: int = 16, filter_doc_id=None, query_embedding=None, lexical_result=None):
     if filter_doc_id is None:
         filter_doc_id = st.session_state.active_doc_id
 
-    # Use plural to support lists
-    results = match_chunks(q_emb, match_count=k, filter_document_ids=filter_doc_id)
-
-    # Return early if retrieval fails or scope is completely empty
-    if not results:
-        return "", []
-
-    unique = []
-    seen = set()
-    for r in results:
-        key = (r["content"][:140] if r.get("content") else "").strip().lower()
-        if not key or key in seen:
-            continue
-        seen.add(key)
-        unique.append(r)
-
-    results = unique[:k]
-    st.session_state.last_retrieval = results
-
-    src_chunks = []
-    for r in results:
-        doc_name = st.session_state.doc_map.get(r["document_id"], f"doc_{r['document_id']}")
-        src_chunks.append(
-            SourceChunk(
-                doc_name=doc_name,
-                chunk_index=r["chunk_index"],
-                content=r["content"],
-            )
-        )
+    context, results = _build_context(
+        query,
+        k=k,
+        filter_doc_ids=filter_doc_id,
+        query_embedding=query_embedding,
+        lexical_result=lexical_result,
+    )
+    if results:
+        st.session_state.last_retrieval = results
+    return context, results
 
-    # Dynamically scale limit_chars based on 'k' so we don't truncate large retrievals
-    dynamic_limit = k * 1500
-    return format_sources(src_chunks, limit_chars=dynamic_limit), results
+def retrieve_sources_for_section(section_title: str, k: int = 18):
+    # Rows are returned too so LongWriter can record which chunks each section used
+    return build_context(section_title, k=k, filter_doc_id=st.session_state.active_doc_id)
 
-def retrieve_sources_for_section(section_title: str, k: int = 18) -> str:
-    ctx, _ = build_context(section_title, k=k, filter_doc_id=st.session_state.active_doc_id)
-    return ctx
+# ---------------------------
+# Handbook artifacts render
+# ---------------------------
+def render_handbook(artifact_id: str):
+    # Only metadata is read on every rerun; section text is loaded when opened
+    if not exists(artifact_id):
+        st.info(f"📘 This handbook is no longer available (artifact `{artifact_id}` was removed).")
+        return
+    meta = load_meta(artifact_id)
+    st.markdown(f"**📘 Handbook: {meta['topic']}**")
+    st.caption(f"📊 {meta['words']:,} words · {len(meta['sections'])} sections")
+
+    if not st.toggle("Open handbook", key=f"open_{artifact_id}"):
+        return
+
+    titles = [sec["title"] for sec in meta["sections"]]
+    idx = st.selectbox(
+        "Section",
+        options=range(len(titles)),
+        format_func=lambda i: titles[i],
+        key=f"section_{artifact_id}",
+    )
+    st.markdown(read_section(artifact_id, idx))
+
+    with open(artifact_path(artifact_id), "rb") as f:
+        st.download_button(
+            "📥 Download Handbook (Markdown)",
+            f,
+            file_name=f"handbook_{meta['topic'][:40].replace(' ', '_')}.md",
+            type="primary",
+            key=f"download_{artifact_id}",
+        )
 
 # ---------------------------
 # Chat history render
 # ---------------------------
 for m in st.session_state.messages:
     with st.chat_message(m["role"]):
-        st.markdown(m["content"])
+        if m.get("artifact_id"):
+            render_handbook(m["artifact_id"])
+        else:
+            st.markdown(m["content"])
 
 # ---------------------------
 # Handle user input
 # ---------------------------
-user_input = st.chat_input("Ask a question, or say: Generate a handbook on <topic>")
+user_input = st.chat_input("Ask a question, or say: Generate (or Regenerate) a handbook on <topic>")
 
 if user_input:
     st.session_state.messages.append({"role": "user", "content": user_input})
@@ -277,74 +308,115 @@ if user_input:
     active_doc = st.session_state.active_doc_id  # respect selected scope
 
     # 1. Handbook request
-    if lower.startswith("generate a handbook on") or lower.startswith("create a handbook on"):
-        topic = user_input.split("on", 1)[-1].strip()
+    if lower.startswith(("generate a handbook on", "create a handbook on", "regenerate a handbook on")):
+        topic = user_input.split(" on ", 1)[-1].strip()
+        regenerate = lower.startswith("regenerate")
+        previous = None
+        if regenerate:
+            # Looked up on disk so it also works after a page reload
+            previous_id = latest_for_topic(topic)
+            previous = load_manifest(previous_id) if previous_id else None
 
         with st.chat_message("assistant"):
+            if regenerate and previous is None:
+                st.info(f"No previous handbook found for '{topic}', so this is a full generation.")
             with st.spinner(f"📝 Architecting handbook on '{topic}'. This may take several minutes..."):
-                context, _ = build_context(topic, k=24, filter_doc_id=active_doc)
+                # Outline from compact document summaries when the scope is small enough
+                context, rows = build_overview_context(llm, active_doc, max_workers=4)
+                if context:
+                    st.session_state.last_retrieval = rows
+                else:
+                    context, _ = build_context(topic, k=24, filter_doc_id=active_doc)
 
                 if not context.strip():
                     st.warning("No context found for the selected scope. Try checking your documents.")
                     handbook_md = "I couldn't find sufficient context in the indexed PDFs for the selected scope."
                 else:
-                    handbook_md = writer.generate_handbook(
+                    # With a previous manifest only sections whose sources changed are rewritten
+                    handbook_md, manifest = writer.generate_handbook_with_manifest(
                         topic=topic,
                         initial_sources_text=context,
                         retrieve_sources_for_section=retrieve_sources_for_section,
                         target_words=20000,
-                        section_token_budget=3500,
                         per_section_k=25,
+                        previous=previous,
                     )
+                    if previous is not None:
+                        reused = sum(1 for s in manifest.sections if s.reused)
+                        st.caption(f"♻️ Reused {reused} of {len(manifest.sections)} sections from the previous run")
 
-            st.markdown(handbook_md)
-            
-            # Prevent word count and download button for empty handbook runs
+            # Empty runs stay a plain message; real handbooks go to disk and history keeps a reference
             if context.strip():
-                # ADDED: Live word counter
-                st.info(f"📊 Current handbook length: {len(handbook_md.split()):,} words")
-                
-                st.download_button(
-                    "📥 Download Handbook (Markdown)",
-                    handbook_md,
-                    file_name=f"handbook_{topic[:40].replace(' ', '_')}.md",
-                    type="primary"
-                )
-
-        st.session_state.messages.append({"role": "assistant", "content": handbook_md})
+                artifact_id = save_handbook(handbook_md, topic, manifest)
+                render_handbook(artifact_id)
+                message = {"role": "assistant", "content": f"📘 Handbook: {topic}", "artifact_id": artifact_id}
+            else:
+                st.markdown(handbook_md)
+                message = {"role": "assistant", "content": handbook_md}
+
+        st.session_state.messages.append(message)
 
     # 2. Normal Q&A
     else:
         with st.chat_message("assistant"):
             with st.spinner("Analyzing documents..."):
-                if any(w in lower for w in ["Provide an overview", "Provide a summary", "summary", "abstract", "Provide the key findings", "conclusion"]):
-                    retrieval_query = "abstract introduction methodology results discussion conclusion key findings"
-                    # INCREASED 'k' for broad questions to 50
-                    context, rows = build_context(retrieval_query, k=50, filter_doc_id=active_doc)
-                else:
-                    context, rows = build_context(user_input, k=16, filter_doc_id=active_doc)
-
-                # Bypass LLM entirely if we have an empty context
-                if not context.strip():
-                    answer = "I couldn't find that in the indexed PDFs for the selected scope. Try rephrasing your question or select different documents."
+                is_overview = any(w in lower for w in ["Provide an overview", "Provide a summary", "summary", "abstract", "Provide the key findings", "conclusion"])
+                q_emb = lexical_result = cached = None
+                if not is_overview:
+                    # Confident exact-term lookups need no embedding at all; otherwise the
+                    # query is embedded once for the answer cache and reused for vector search
+                    lexical_result = lexical_search(user_input, k=16, filter_doc_ids=active_doc)
+                    if not lexical_result[1]:
+                        q_emb = embed_query_cached(user_input)
+                        signature = scope_signature(active_doc)
+                        # Near-duplicate questions over the same documents reuse the stored answer
+                        cached = answer_cache.lookup(q_emb, active_doc, signature)
+
+                if cached:
+                    answer = cached["answer"]
+                    st.caption(f"⚡ Cached answer for a similar question: \"{cached['question']}\" (similarity {cached['similarity']:.2f})")
                 else:
-                    grounded_rules = (
-                        "Rules:\n"
-                        "- Answer ONLY using the Context.\n"
-                        "- If the answer is not in the Context, say: \"I couldn't find that in the indexed PDFs.\" "
-                        "Then ask a clarifying question.\n"
-                        "- Cite sources at the end of each paragraph like: (Doc: <n>, Chunk: <index>).\n"
-                        "- Never claim the user did not provide a document if Context is present.\n"
-                    )
-
-                    prompt = f"{SYSTEM_CHAT}\n\nContext:\n{context}\n\nUser question: {user_input}\n\n{grounded_rules}"
-
-                    messages = [
-                        {"role": "system", "content": SYSTEM_CHAT},
-                        {"role": "user", "content": prompt},
-                    ]
-
-                    answer = llm.chat(messages, temperature=0.2, max_tokens=1500)
+                    if is_overview:
+                        # Precomputed summary tree first; fall back to broad chunk retrieval
+                        context, rows = build_overview_context(llm, active_doc, max_workers=4)
+                        if context:
+                            st.session_state.last_retrieval = rows
+                        else:
+                            retrieval_query = "abstract introduction methodology results discussion conclusion key findings"
+                            # INCREASED 'k' for broad questions to 50
+                            context, rows = build_context(retrieval_query, k=50, filter_doc_id=active_doc)
+                    else:
+                        context, rows = build_context(
+                            user_input,
+                            k=16,
+                            filter_doc_id=active_doc,
+                            query_embedding=q_emb,
+                            lexical_result=lexical_result,
+                        )
+
+                    # Bypass LLM entirely if we have an empty context
+                    if not context.strip():
+                        answer = "I couldn't find that in the indexed PDFs for the selected scope. Try rephrasing your question or select different documents."
+                    else:
+                        grounded_rules = (
+                            "Rules:\n"
+                            "- Answer ONLY using the Context.\n"
+                            "- If the answer is not in the Context, say: \"I couldn't find that in the indexed PDFs.\" "
+                            "Then ask a clarifying question.\n"
+                            "- Cite sources at the end of each paragraph like: (Doc: <n>, Chunk: <index>).\n"
+                            "- Never claim the user did not provide a document if Context is present.\n"
+                        )
+
+                        prompt = f"{SYSTEM_CHAT}\n\nContext:\n{context}\n\nUser question: {user_input}\n\n{grounded_rules}"
+
+                        messages = [
+                            {"role": "system", "content": SYSTEM_CHAT},
+                            {"role": "user", "content": prompt},
+                        ]
+
+                        answer = llm.chat(messages, temperature=0.2, route="chat")
+                        if q_emb is not None:
+                            answer_cache.store(q_emb, user_input, answer, active_doc, signature)
             
             st.markdown(answer)
         